@@ -1,490 +1,269 @@
+import startup
+import os
 import dash
-import dash_core_components as dcc
-import dash_html_components as html
-from dash.dependencies import Input, Output
-import plotly.graph_objs as go
-import plotly.express as px
-import pandas as pd
-import sqlite3
-from sqlite3 import Error
+from dash import dcc, html, Patch
+from dash.dependencies import Input, Output, State, ClientsideFunction
 from datetime import date
+startup.mark('import dash')
+import api
+import data_cube
+import derived_metrics
+import figure_cache
+import http_cache
+import telemetry
+import mailing_list
+from mailing_list import EmailWriter
+startup.mark('import modules')
 
 
-def create_connection(file):
-    conn = None
-    try:
-        conn = sqlite3.connect(file)
-    except Error as e:
-        print(e)
-
-    return conn
-
-
-def create_table(conn, create_table_sql):
-    """ create a table from the create_table_sql statement
-    :param conn: Connection object
-    :param create_table_sql: a CREATE TABLE statement
-    :return:
-    """
-    try:
-        c = conn.cursor()
-        c.execute(create_table_sql)
-    except Error as e:
-        print(e)
-
-
-def create_email(conn, email):
-    """
-    Create a new email into the emails table
-    :param conn:
-    :param email:
-    :return: email id
-    """
-    sql = ''' INSERT INTO emails(email,date)
-              VALUES(?,?) '''
-    cur = conn.cursor()
-    cur.execute(sql, email)
-    conn.commit()
-    return cur.lastrowid
+# draw the maps in the browser from data shipped with the page instead of calling the server
+CLIENTSIDE_MAPS = bool(os.environ.get('CLIENTSIDE_MAPS'))
+# list every script in the page instead of loading the graph scripts on demand, for export_static.py
+EAGER_LOADING = bool(os.environ.get('EAGER_LOADING'))
 
+database = mailing_list.DATABASE
+writer = EmailWriter(database)
 
-if __name__ == '__main__':
-    database = r"SQLDatabase.db"
-    conn = create_connection(database)
-
-    sql_create_emails_table = """ CREATE TABLE IF NOT EXISTS emails (
-                                            id integer PRIMARY KEY,
-                                            email text NOT NULL,
-                                            date text
-                                        ); """
-    if conn is not None:
-        # create email table
-        create_table(conn, sql_create_emails_table)
-    else:
-        print("Error! cannot create the database connection.")
-
-df = pd.read_csv('Compiled data.csv')
+# load the data now instead of on the first request
+data_cube.current()
+startup.mark('load data')
 
-app = dash.Dash()
+app = dash.Dash(eager_loading=EAGER_LOADING)
+server = app.server
+http_cache.enable(app)
+telemetry.instrument(app)
+api.register(app)
 
 
 @app.callback(
     dash.dependencies.Output('container-button-basic', 'children'),
     [dash.dependencies.Input('submit-val', 'n_clicks')],
-    [dash.dependencies.State('input-on-submit', 'value')])
+    [dash.dependencies.State('input-on-submit', 'value')],
+    # nothing to do before the first click, and a page served from static files should not call the app
+    prevent_initial_call=True)
 def update_output(n_clicks, value):
-    conn = create_connection(database)
-    with conn:
-        if value is not None:
-            email = (value, date.today())
-            email_id = create_email(conn, email)
+    if value is not None:
+        email = mailing_list.normalize_email(value)
+        if email is None:
+            return 'Please enter a valid email address.'
+        with telemetry.timer('update_output', 'queue'):
+            writer.submit((email, date.today().isoformat()))
 
 
 # Group bar of deaths vs cases
-filtered_df = df
-filtered_df['CaseCount'] = pd.to_numeric(filtered_df['CaseCount'], errors='coerce')
-filtered_df['DeathCount'] = pd.to_numeric(filtered_df['DeathCount'], errors='coerce')
-case_df = filtered_df.groupby(['CancerType'])['CaseCount'].sum().reset_index()
-death_df = filtered_df.groupby(['CancerType'])['DeathCount'].sum().reset_index()
-trace1 = go.Bar(x=case_df['CancerType'], y=case_df['CaseCount'], name='Cases', marker={'color': '#FFD700'})
-trace2 = go.Bar(x=death_df['CancerType'], y=death_df['DeathCount'], name='Deaths', marker={'color': '#CD7F32'})
-data_barchart = [trace1, trace2]
-
-app.layout = html.Div(style={'background-color': '#567ca7', 'margin': '-21px -8px', 'height': '951px'}, children=[
-    html.Br(),
-    html.H1(children='KNOW YOUR CANCER',
-            style={
-                'text-align': 'center',
-                'color': 'white',
-                'font-family': 'helvetica',
-                'font-size': '40px'
-            }),
-    html.H3(children='This site is designed to show the rates of cancer across the U.S., to not only raise awareness'
-                     ' about what types of cancers are affecting your local area, but also to help those who visit our'
-                     ' site find out what the symptoms of those cancers may be in order to protect not only themselves,'
-                     ' but their loved ones. Looking through our site users can find links to more information about'
-                     ' cancer, where a certain type of cancer is most prolific in order to find out what they might'
-                     ' want to get tested for, and what types of cancer could be most effecting their local communities'
-                     ' in order to donate or support those affected by cancer the most',
-            title='This information was taken from the CDCs website',
-            style={
-                'textAlign': 'center', 'font-family': 'helvetica', 'color': 'white', 'margin': '20px 350px'
-            }),
-    html.Br(),
-    dcc.Tabs([
-        dcc.Tab(label='MAPS', style={'background': '#47678c', 'border': 'none', 'font-family': 'helvetica',
-                                     'color': 'white', 'font-weight': 'bold'},
-                selected_style={'background': '#6796cb', 'border': 'none', 'font-family': 'helvetica',
-                                'color': 'white', 'font-weight': 'bold'},
-                children=[
+def bar_chart(totals):
+    trace1 = {'type': 'bar', 'x': totals['CancerType'].tolist(), 'y': totals['CaseCount'].tolist(), 'name': 'Cases',
+              'marker': {'color': '#FFD700'}}
+    trace2 = {'type': 'bar', 'x': totals['CancerType'].tolist(), 'y': totals['DeathCount'].tolist(),
+              'name': 'Deaths', 'marker': {'color': '#CD7F32'}}
+    return {
+        'data': [trace1, trace2],
+        'layout': {'xaxis': {'title': {'text': 'Cancer Type'}, 'automargin': True},
+                   'yaxis': {'title': {'text': 'Cases vs Deaths'}},
+                   'paper_bgcolor': '#567ca7', 'font': {'color': 'white'}}
+    }
+
+
+# dropdown labels that differ from the CDC's CancerType values
+CANCER_LABELS = {
+    'Brain and Other Nervous System': 'Brain and Nervous System',
+    'Corpus and Uterus NOS': 'Corpus and Uterus',
+}
+
+# Cancer.net pages listed on the MORE INFORMATION tab
+CANCER_LINKS = [
+    ("Brain and Nervous System", 'cancer-types/brain-tumor/introduction'),
+    ("Breast", 'cancer-types/breast-cancer/introduction'),
+    ("Cervical", 'cancer-types/cervical-cancer/introduction'),
+    ("Colon and Rectal", 'cancer-types/colorectal-cancer/introduction'),
+    ("Uterine", 'cancer-types/uterine-cancer/introduction'),
+    ("Esophageal", 'cancer-types/esophageal-cancer/introduction'),
+    ("Hodgkin Lymphoma", 'cancer-types/lymphoma-hodgkin/introduction'),
+    ("Kaposi Sarcoma", 'cancer-types/sarcoma-kaposi/introduction'),
+    ("Kidney", 'cancer-types/kidney-cancer/introduction'),
+    ("Larynx - Laryngeal and Hypopharyngeal", 'cancer-types/laryngeal-and-hypopharyngeal-cancer/introduction'),
+    ("Leukemia", 'navigating-cancer-care/videos/cancer-research-news/'
+                 'leukemia-adults-%E2%80%93-introduction-with-dr-bruno-medeiros'),
+    ("Liver", 'cancer-types/liver-cancer/introduction'),
+    ("Lung, Non-Small Cell", 'cancer-types/lung-cancer-non-small-cell/introduction'),
+    ("Lung, Small Cell", 'cancer-types/lung-cancer-small-cell/introduction'),
+    ("Melanoma", 'cancer-types/melanoma/introduction'),
+    ("Mesothelioma", 'cancer-types/mesothelioma/introduction'),
+    ("Multiple Myeloma", 'cancer-types/multiple-myeloma/introduction'),
+    ("Oral and Oropharyngeal", 'cancer-types/oral-and-oropharyngeal-cancer/introduction'),
+    ("Ovary, Fallopian Tube, and Peritoneal", 'cancer-types/ovarian-fallopian-tube-and-peritoneal-cancer/introduction'),
+    ("Pancreas", 'cancer-types/pancreatic-cancer/introduction'),
+    ("Prostate", 'cancer-types/prostate-cancer/introduction'),
+    ("Stomach", 'cancer-types/stomach-cancer/introduction'),
+    ("Testicular", 'cancer-types/testicular-cancer/introduction'),
+    ("Thyroid", 'cancer-types/thyroid-cancer/introduction'),
+    ("Urinary Bladder", 'cancer-types/bladder-cancer/introduction'),
+]
+
+INTRO = ('This site is designed to show the rates of cancer across the U.S., to not only raise awareness'
+         ' about what types of cancers are affecting your local area, but also to help those who visit our'
+         ' site find out what the symptoms of those cancers may be in order to protect not only themselves,'
+         ' but their loved ones. Looking through our site users can find links to more information about'
+         ' cancer, where a certain type of cancer is most prolific in order to find out what they might'
+         ' want to get tested for, and what types of cancer could be most effecting their local communities'
+         ' in order to donate or support those affected by cancer the most')
+
+
+# styles live in assets/style.css, which the browser caches, so the layout json only carries class names
+def tab(label, children, **kwargs):
+    return dcc.Tab(label=label, className='page-tab', selected_className='page-tab--selected', children=children,
+                   **kwargs)
+
+
+def filter_dropdown(cube, dimension, placeholder):
+    return dcc.Dropdown(
+        id='select-' + dimension.lower(),
+        options=[{'label': str(value), 'value': value} for value in cube.options(dimension)],
+        placeholder=placeholder,
+        className='filter'
+    )
+
+
+def link(label, path, className='link-button'):
+    return html.A(label, href='https://www.cancer.net/' + path, target='_blank', className=className)
+
+
+# a function so every page load lists the values of the current data, after an append too
+def serve_layout():
+    cube = data_cube.current()[0]
+    return html.Div(className='page', children=[
+        html.Br(),
+        html.H1(children='KNOW YOUR CANCER', className='title'),
+        html.H3(children=INTRO, title='This information was taken from the CDCs website', className='intro'),
+        html.Div(className='filters', children=[
+            filter_dropdown(cube, 'Year', 'All Years'),
+            filter_dropdown(cube, 'Sex', 'All Sexes'),
+            filter_dropdown(cube, 'Race', 'All Races'),
+            dcc.Dropdown(
+                id='select-metric',
+                options=[{'label': label, 'value': metric} for metric, label in derived_metrics.METRIC_LABELS.items()],
+                value='count',
+                clearable=False,
+                className='filter'
+            ),
+        ]),
+        dcc.Store(id='map-data', data=figure_cache.client_data() if CLIENTSIDE_MAPS else None),
+        html.Br(),
+        dcc.Tabs([
+            tab('MAPS', [
+                html.Br(),
+                dcc.Dropdown(
+                    id='select-cancer',
+                    options=[{'label': CANCER_LABELS.get(cancer, cancer), 'value': cancer}
+                             for cancer in cube.data.cancer_types],
+                    placeholder='Select a Cancer Type',
+                    className='cancer-select'
+                ),
+                html.Br(),
+                dcc.Tabs(id='map-tabs', value='cases', children=[
+                    tab('CASES', value='cases', children=[
+                        html.P("This map shows the amount of cases of cancer type selected above by state:",
+                               className='caption'),
+                        dcc.Graph(id='choropleth')
+                    ]),
+                    tab('DEATHS', value='deaths', children=[
+                        html.P("This map shows the amount of deaths due to the cancer type selected above by state:",
+                               className='caption'),
+                        dcc.Graph(id='choropleth1')
+                    ])
+                ])
+            ]),
+            tab('CASES VS DEATHS', [
+                html.P("This graph shows the amount of cases and deaths for each cancer type for"
+                       " the entire United States:", className='caption'),
+                # the figure comes from display_barchart on page load, except in client-side mode where it
+                # is part of the layout so a page served from static files draws it without the app
+                dcc.Graph(id='graph', className='bar-chart',
+                          **({'figure': bar_chart(cube.totals())} if CLIENTSIDE_MAPS else {}))
+            ]),
+            tab('MORE INFORMATION', [
+                html.Br(),
+                html.Div(className='more-info', children=[
+                    html.Div([
+                        html.P('To be added to our mailing list for more information enter your email'
+                               ' and press submit.', className='notice'),
+                        html.Br(),
+                        html.Div(id='container-button-basic'),
+                        html.Div(dcc.Input(id='input-on-submit', type='email', className='email-input')),
+                        html.Button('Submit', id='submit-val', className='submit-button'),
+                    ]),
+                    html.P("Below is a list of links to Cancer.net where you can find "
+                           "much more information on each cancer type.", className='notice'),
                     html.Br(),
-                    dcc.Dropdown(
-                        id='select-cancer',
-                        options=[
-                            {'label': 'Brain and Nervous System', 'value': 'Brain and Other Nervous System'},
-                            {'label': 'Cervix', 'value': 'Cervix'},
-                            {'label': 'Colon and Rectum', 'value': 'Colon and Rectum'},
-                            {'label': 'Corpus and Uterus', 'value': 'Corpus and Uterus NOS'},
-                            {'label': 'Esophagus', 'value': 'Esophagus'},
-                            {'label': 'Female Breast', 'value': 'Female Breast'},
-                            {'label': 'Hodgkin Lymphoma', 'value': 'Hodgkin Lymphoma'},
-                            {'label': 'Kaposi Sarcoma', 'value': 'Kaposi Sarcoma'},
-                            {'label': 'Kidney and Renal Pelvis', 'value': 'Kidney and Renal Pelvis'},
-                            {'label': 'Larynx', 'value': 'Larynx'},
-                            {'label': 'Leukemias', 'value': 'Leukemias'},
-                            {'label': 'Liver and Intrahepatic Bile Duct', 'value': 'Liver and Intrahepatic Bile Duct'},
-                            {'label': 'Lung and Bronchus', 'value': 'Lung and Bronchus'},
-                            {'label': 'Melanomas of the Skin', 'value': 'Melanomas of the Skin'},
-                            {'label': 'Mesothelioma', 'value': 'Mesothelioma'},
-                            {'label': 'Myeloma', 'value': 'Myeloma'},
-                            {'label': 'Non-Hodgkin Lymphoma', 'value': 'Non-Hodgkin Lymphoma'},
-                            {'label': 'Oral Cavity and Pharynx', 'value': 'Oral Cavity and Pharynx'},
-                            {'label': 'Ovary', 'value': 'Ovary'},
-                            {'label': 'Pancreas', 'value': 'Pancreas'},
-                            {'label': 'Prostate', 'value': 'Prostate'},
-                            {'label': 'Stomach', 'value': 'Stomach'},
-                            {'label': 'Testis', 'value': 'Testis'},
-                            {'label': 'Thyroid', 'value': 'Thyroid'},
-                            {'label': 'Urinary Bladder', 'value': 'Urinary Bladder'}
-                        ],
-                        placeholder='Select a Cancer Type',
-                        style={'margin': 'auto', 'width': '40%'}
-                    ),
                     html.Br(),
-                    dcc.Tabs([
-                        dcc.Tab(label='CASES',
-                                style={'background': '#47678c', 'border': 'none', 'font-family': 'helvetica',
-                                       'color': 'white', 'font-weight': 'bold'},
-                                selected_style={'background': '#6796cb', 'border': 'none', 'font-family': 'helvetica',
-                                                'color': 'white', 'font-weight': 'bold'},
-                                children=[
-                                    html.P("This map shows the amount of cases of cancer type selected above by state:",
-                                           style={'font-family': 'helvetica', 'color': 'white',
-                                                  'text-align': 'center', 'margin': '50px 200px 0px',
-                                                  'font-weight': 'bold', 'font-size': '18px'}),
-                                    dcc.Graph(id='choropleth')
-                                ]),
-                        dcc.Tab(label='DEATHS',
-                                style={'background': '#47678c', 'border': 'none', 'font-family': 'helvetica',
-                                       'color': 'white', 'font-weight': 'bold'},
-                                selected_style={'background': '#6796cb', 'border': 'none', 'font-family': 'helvetica',
-                                                'color': 'white', 'font-weight': 'bold'},
-                                children=[
-                                    html.P("This map shows the amount of deaths due to the cancer type selected above"
-                                           " by state:",
-                                           style={'font-family': 'helvetica', 'color': 'white',
-                                                  'text-align': 'center', 'margin': '50px 200px 0px',
-                                                  'font-weight': 'bold', 'font-size': '18px'}),
-                                    dcc.Graph(id='choropleth1')
-                                ])
-                    ])
-                ]),
-        dcc.Tab(label='CASES VS DEATHS', style={'background': '#47678c', 'border': 'none', 'font-family': 'helvetica',
-                                                'color': 'white', 'font-weight': 'bold'},
-                selected_style={'background': '#6796cb', 'border': 'none', 'font-family': 'helvetica',
-                                'color': 'white', 'font-weight': 'bold'},
-                children=[
-                    html.P("This graph shows the amount of cases and deaths for each cancer type for"
-                           " the entire United States:", style={'font-family': 'helvetica', 'color': 'white',
-                                                                'text-align': 'center', 'margin': '50px 200px 0px',
-                                                                'font-weight': 'bold', 'font-size': '18px'}),
-                    dcc.Graph(id='graph',
-                              figure={
-                                  'data': data_barchart,
-                                  'layout': go.Layout(xaxis={'title': 'Cancer Type',
-                                                             'automargin': True, },
-                                                      yaxis={'title': 'Cases vs Deaths'},
-                                                      paper_bgcolor='#567ca7', font={'color': 'white'})
-                              },
-                              style={'height': '700px'},
-                              )
-                ]),
-        dcc.Tab(label='MORE INFORMATION', style={'background': '#47678c', 'border': 'none', 'font-family': 'helvetica',
-                                                 'color': 'white', 'font-weight': 'bold'},
-                selected_style={'background': '#6796cb', 'border': 'none', 'font-family': 'helvetica',
-                                'color': 'white', 'font-weight': 'bold'},
-                children=[
+                    link("Cancer.net's Homepage", '', 'link-button link-button--home'),
                     html.Br(),
-                    html.Div(style={'text-align': 'center'}, children=[
-                        html.Div([
-                            html.P('To be added to our mailing list for more information enter your email'
-                                   ' and press submit.',
-                                   style={'color': 'white', 'font-family': 'helvetica', 'font-size': '18px',
-                                          'font-weight': 'bold'}),
-                            html.Br(),
-                            html.Div(id='container-button-basic'),
-                            html.Div(dcc.Input(id='input-on-submit', type='email', style={'width': '300px',
-                                                                                          'height': '30px',
-                                                                                          'font-size': '18px',
-                                                                                          'font-family': 'helvetica'})),
-                            html.Button('Submit', id='submit-val', style={'margin': '20px', 'width': '100px',
-                                                                          'height': '40px', 'font-size': '18px',
-                                                                          'font-family': 'helvetica'}),
-                        ]),
-                        html.P(
-                            "Below is a list of links to Cancer.net where you can find "
-                            "much more information on each cancer type.",
-                            style={'color': 'white', 'font-family': 'helvetica', 'font-size': '18px',
-                                   'font-weight': 'bold'}),
-                        html.Br(),
-                        html.Br(),
-                        html.A("Cancer.net's Homepage", href='https://www.cancer.net/',
-                               target='_blank', style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                       'display': 'inline-block', 'text-decoration': 'none',
-                                                       'font-family': 'helvetica', 'font-size': '18px',
-                                                       'margin': '10px'}),
-                        html.Br(),
-                        html.Div(className='flex-container', style={'display': 'flex', 'height': '150px',
-                                                                    'flex-wrap': 'wrap', 'justify-content': 'center'},
-                                 children=[
-                                     html.A("Brain and Nervous System",
-                                            href='https://www.cancer.net/cancer-types/brain-tumor/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Breast",
-                                            href='https://www.cancer.net/cancer-types/breast-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Cervical",
-                                            href='https://www.cancer.net/cancer-types/cervical-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Colon and Rectal",
-                                            href='https://www.cancer.net/cancer-types/colorectal-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Uterine",
-                                            href='https://www.cancer.net/cancer-types/uterine-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Esophageal",
-                                            href='https://www.cancer.net/cancer-types/esophageal-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Hodgkin Lymphoma",
-                                            href='https://www.cancer.net/cancer-types/lymphoma-hodgkin/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Kaposi Sarcoma",
-                                            href='https://www.cancer.net/cancer-types/sarcoma-kaposi/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Kidney",
-                                            href='https://www.cancer.net/cancer-types/kidney-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Larynx - Laryngeal and Hypopharyngeal",
-                                            href='https://www.cancer.net/cancer-types/laryngeal-and-hypopharyngeal-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Leukemia",
-                                            href='https://www.cancer.net/navigating-cancer-care/videos/cancer-research-news/leukemia-adults-%E2%80%93-introduction-with-dr-bruno-medeiros',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Liver",
-                                            href='https://www.cancer.net/cancer-types/liver-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Lung, Non-Small Cell",
-                                            href='https://www.cancer.net/cancer-types/lung-cancer-non-small-cell/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Lung, Small Cell",
-                                            href='https://www.cancer.net/cancer-types/lung-cancer-small-cell/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Melanoma",
-                                            href='https://www.cancer.net/cancer-types/melanoma/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Mesothelioma",
-                                            href='https://www.cancer.net/cancer-types/mesothelioma/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Multiple Myeloma",
-                                            href='https://www.cancer.net/cancer-types/multiple-myeloma/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Oral and Oropharyngeal",
-                                            href='https://www.cancer.net/cancer-types/oral-and-oropharyngeal-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Ovary, Fallopian Tube, and Peritoneal",
-                                            href='https://www.cancer.net/cancer-types/ovarian-fallopian-tube-and-peritoneal-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Pancreas",
-                                            href='https://www.cancer.net/cancer-types/pancreatic-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Prostate",
-                                            href='https://www.cancer.net/cancer-types/prostate-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Stomach",
-                                            href='https://www.cancer.net/cancer-types/stomach-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Testicular",
-                                            href='https://www.cancer.net/cancer-types/testicular-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Thyroid",
-                                            href='https://www.cancer.net/cancer-types/thyroid-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br(),
-                                     html.A("Urinary Bladder",
-                                            href='https://www.cancer.net/cancer-types/bladder-cancer/introduction',
-                                            target='_blank',
-                                            style={'background-color': '#edd139', 'padding': '15px 50px',
-                                                   'display': 'inline-block', 'text-decoration': 'none',
-                                                   'font-family': 'helvetica', 'font-size': '18px',
-                                                   'margin': '5px'}),
-                                     html.Br()
-                                 ])
-                    ])
+                    html.Div(className='flex-container', children=[link(label, path) for label, path in CANCER_LINKS])
                 ])
+            ])
+        ])
     ])
-])
 
 
-# Choropleth US map of cases of selected cancer type
-@app.callback(
-    Output('choropleth', 'figure'),
-    [Input('select-cancer', 'value')])
-def display_choropleth(cancer):
-    new_df = df[df['CancerType'] == cancer]
-    new_df['CaseCount'] = pd.to_numeric(new_df['CaseCount'], errors='coerce')
-    new_df = new_df.sort_values(by=['CaseCount'], ascending=[False])
-    fig = px.choropleth(new_df, locations='Code', locationmode='USA-states', color_continuous_scale='deep',
-                        color='CaseCount', hover_name='Area')
-
-    fig.update_layout(
-        geo_scope='usa',
-        height=700,
-        paper_bgcolor='#567ca7',
-        font={'color': 'white'},
-        geo=dict(showlakes=True, lakecolor='rgb(255,255,255)')
-    )
-    return fig
+app.layout = serve_layout
+startup.cache_layout(app, lambda: data_cube.current()[1])
+startup.mark('layout')
+
+
+filter_inputs = [Input('select-year', 'value'), Input('select-sex', 'value'), Input('select-race', 'value')]
+
+
+# map tab value -> (graph, column it shows)
+MAP_TABS = {'cases': ('choropleth', 'CaseCount'), 'deaths': ('choropleth1', 'DeathCount')}
 
 
-# Choropleth US map of deaths of selected cancer type
+map_outputs = [Output('choropleth', 'figure'), Output('choropleth1', 'figure')]
+map_inputs = [Input('select-cancer', 'value')] + filter_inputs + [Input('map-tabs', 'value'),
+                                                                  Input('select-metric', 'value')]
+
+
+# Choropleth US maps of cases and deaths of selected cancer type, only the visible one is rendered
+def display_choropleth(cancer, year, sex, race, tab, metric='count'):
+    graph, column = MAP_TABS.get(tab, MAP_TABS['cases'])
+    column = derived_metrics.map_column(column, metric)
+    # a map that was hidden may be stale or empty, and each metric has its own color bar, so those
+    # get the full figure, after that only the per state arrays change
+    if dash.callback_context.triggered_id in (None, 'map-tabs', 'select-metric'):
+        with telemetry.timer('display_choropleth', 'figure'):
+            figure = figure_cache.get_figure(cancer, column, year, sex, race)
+    else:
+        with telemetry.timer('display_choropleth', 'filter'):
+            trace = figure_cache.get_trace(cancer, column, year, sex, race)
+        with telemetry.timer('display_choropleth', 'figure'):
+            figure = Patch()
+            figure['data'][0].update(trace)
+    return [figure if name == graph else dash.no_update for name, _ in MAP_TABS.values()]
+
+
+if CLIENTSIDE_MAPS:
+    # same maps drawn by assets/maps.js from the map-data store
+    app.clientside_callback(
+        ClientsideFunction(namespace='maps', function_name='display_choropleth'),
+        map_outputs, map_inputs, [State('map-data', 'data')])
+else:
+    app.callback(map_outputs, map_inputs)(display_choropleth)
+
+
+# Group bar of the filtered national totals
 @app.callback(
-    Output('choropleth1', 'figure'),
-    [Input('select-cancer', 'value')])
-def display_choropleth(cancer):
-    new_df = df[df['CancerType'] == cancer]
-    new_df['DeathCount'] = pd.to_numeric(new_df['DeathCount'], errors='coerce')
-    new_df = new_df.sort_values(by=['DeathCount'], ascending=[False])
-    fig = px.choropleth(new_df, locations=new_df['Code'], locationmode='USA-states', color_continuous_scale='deep',
-                        color='DeathCount', hover_name='Area')
-
-    fig.update_layout(
-        geo_scope='usa',
-        height=700,
-        paper_bgcolor='#567ca7',
-        font={'color': 'white'},
-        geo=dict(showlakes=True, lakecolor='rgb(255,255,255)')
-    )
-    return fig
+    Output('graph', 'figure'),
+    filter_inputs,
+    prevent_initial_call=CLIENTSIDE_MAPS)
+def display_barchart(year, sex, race):
+    with telemetry.timer('display_barchart', 'filter'):
+        cube, version = data_cube.current()
+        totals = cube.totals(year, sex, race)
+    with telemetry.timer('display_barchart', 'figure'):
+        return bar_chart(totals)
+
 
+startup.report()
 
 if __name__ == '__main__':
+    mailing_list.init_db(database)
     app.run_server()
@@ -0,0 +1,167 @@
+""" Read-only JSON API over the same aggregates as the dashboard, mounted at /api/v1.
+
+    GET /api/v1/cancers                  cancer types and filter values
+    GET /api/v1/national                 national counts of every cancer type, like the bar chart
+    GET /api/v1/cancers/<cancer>/states  per state counts and metrics of one cancer type, like the maps
+    GET /api/v1/states/<code>            one state's counts and metrics for every cancer type
+
+The last three take the dashboard's filters as year, sex and race, and fields=a,b to
+return only some columns. Responses are cached per data version, gzipped when the
+client accepts it, and answered with 304 when the client's ETag or date is current.
+"""
+import os
+import gzip
+import hashlib
+import threading
+from datetime import datetime, timezone
+import flask
+import pandas as pd
+import data_cube
+import telemetry
+
+PREFIX = 'api/v1'
+# responses kept in memory per worker, the oldest is dropped after that
+CACHE_SIZE = int(os.environ.get('API_CACHE_SIZE', 1024))
+
+_lock = threading.Lock()
+_version = None
+# (path, query) -> (json bytes, gzipped bytes, etag, last modified)
+_responses = {}
+
+
+class ApiError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def last_modified(version):
+    """ time the data was last written, from a data version tuple """
+    return datetime.fromtimestamp(max(mtime for mtime, size in version) / 1e9, tz=timezone.utc)
+
+
+def _filters(cube, args):
+    filters = {}
+    for dimension in data_cube.DIMENSIONS:
+        value = args.get(dimension.lower())
+        if value is not None and dimension == 'Year':
+            try:
+                value = int(value)
+            except ValueError:
+                raise ApiError(400, "year must be a number")
+        if value is not None and value not in cube.options(dimension):
+            raise ApiError(404, "no data for %s %s" % (dimension.lower(), value))
+        filters[dimension.lower()] = value
+    return filters
+
+
+def _select(rows, args):
+    fields = args.get('fields')
+    if not fields:
+        return rows
+    fields = fields.split(',')
+    unknown = [field for field in fields if field not in rows.columns]
+    if unknown:
+        raise ApiError(400, "unknown fields: %s, choose from %s" % (','.join(unknown), ','.join(rows.columns)))
+    return rows[fields]
+
+
+def _records(rows):
+    return rows.to_json(orient='records', double_precision=4)
+
+
+def cancers(cube, args):
+    return '{"cancers":%s,%s}' % (
+        pd.Series(cube.data.cancer_types).to_json(orient='values'),
+        ','.join('"%s":%s' % (dimension.lower(), pd.Series(cube.options(dimension)).to_json(orient='values'))
+                 for dimension in data_cube.DIMENSIONS))
+
+
+def national(cube, args):
+    filters = _filters(cube, args)
+    return '{"data":%s}' % _records(_select(cube.totals(**filters), args))
+
+
+def cancer_states(cube, args, cancer):
+    if cancer not in cube.data.cancer_types:
+        raise ApiError(404, "unknown cancer type %s" % cancer)
+    filters = _filters(cube, args)
+    return '{"cancer":%s,"data":%s}' % (pd.Series([cancer]).to_json(orient='values')[1:-1],
+                                        _records(_select(cube.map_rows(cancer, **filters), args)))
+
+
+def state(cube, args, code):
+    filters = _filters(cube, args)
+    code = code.upper()
+    frames = []
+    for cancer in cube.data.cancer_types:
+        rows = cube.map_rows(cancer, **filters)
+        rows = rows[rows['Code'] == code]
+        if len(rows):
+            frames.append(rows.assign(CancerType=cancer))
+    if not frames:
+        raise ApiError(404, "no data for state %s" % code)
+    rows = pd.concat(frames, ignore_index=True)
+    rows = rows[['CancerType'] + [column for column in rows.columns if column != 'CancerType']]
+    return '{"state":"%s","data":%s}' % (code, _records(_select(rows, args)))
+
+
+def _cached(build, *path_args):
+    global _version, _responses
+    cube, version = data_cube.current()
+    if version != _version:
+        with _lock:
+            if version != _version:
+                _responses = {}
+                _version = version
+    request = flask.request
+    key = (request.path, tuple(sorted(request.args.items(multi=True))))
+    entry = _responses.get(key)
+    telemetry.count('api_cache_requests_total', result='miss' if entry is None else 'hit')
+    if entry is None:
+        body = build(cube, request.args, *path_args).encode()
+        entry = (body, gzip.compress(body, 6), hashlib.sha1(body).hexdigest(), last_modified(version))
+        with _lock:
+            if len(_responses) >= CACHE_SIZE:
+                _responses.pop(next(iter(_responses)), None)
+            _responses[key] = entry
+    return entry
+
+
+def _respond(build, *path_args):
+    try:
+        body, zipped, etag, modified = _cached(build, *path_args)
+    except ApiError as e:
+        return flask.jsonify(error=e.message), e.status
+    request = flask.request
+    response = flask.Response(mimetype='application/json')
+    response.set_etag(etag)
+    response.last_modified = modified
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    if request.if_none_match.contains(etag) or \
+            (not request.if_none_match and request.if_modified_since and request.if_modified_since >= modified
+             .replace(microsecond=0)):
+        response.status_code = 304
+        return response
+    if 'gzip' in request.accept_encodings:
+        response.set_data(zipped)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response.set_data(body)
+    return response
+
+
+def register(app):
+    """ mount the API on the Dash app's Flask server
+    :param app: Dash app
+    """
+    api = flask.Blueprint('api', __name__, url_prefix=app.config.routes_pathname_prefix + PREFIX)
+    api.add_url_rule('/cancers', 'cancers', lambda: _respond(cancers))
+    api.add_url_rule('/national', 'national', lambda: _respond(national))
+    api.add_url_rule('/cancers/<path:cancer>/states', 'cancer_states',
+                     lambda cancer: _respond(cancer_states, cancer))
+    api.add_url_rule('/states/<code>', 'state', lambda code: _respond(state, code))
+    app.server.register_blueprint(api)
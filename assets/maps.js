@@ -0,0 +1,85 @@
+/* Client-side map switching, used when the app runs with CLIENTSIDE_MAPS set.
+   The map-data store holds one base figure and the counts of every map; the derived
+   metrics are computed here the same way derived_metrics.py computes them. */
+(function () {
+    function per100k(counts, population) {
+        return counts.map(function (count, i) {
+            var people = population[i];
+            return count === null || !people ? null : count / people * 100000;
+        });
+    }
+
+    function ratio(deaths, cases) {
+        return deaths.map(function (death, i) {
+            return death === null || !cases[i] ? null : death / cases[i];
+        });
+    }
+
+    // 1 for the highest rate, ties share the best rank
+    function rank(rates) {
+        return rates.map(function (rate) {
+            if (rate === null) {
+                return null;
+            }
+            return 1 + rates.filter(function (other) { return other !== null && other > rate; }).length;
+        });
+    }
+
+    // share of states at or below the rate, ties count half like pandas' average rank
+    function percentile(rates) {
+        var valid = rates.filter(function (rate) { return rate !== null; });
+        return rates.map(function (rate) {
+            if (rate === null) {
+                return null;
+            }
+            var below = valid.filter(function (other) { return other < rate; }).length;
+            var equal = valid.filter(function (other) { return other === rate; }).length;
+            return (below + (equal + 1) / 2) / valid.length * 100;
+        });
+    }
+
+    var COLUMNS = {
+        CaseCount: function (map) { return map.CaseCount; },
+        DeathCount: function (map) { return map.DeathCount; },
+        CasesPer100k: function (map) { return per100k(map.CaseCount, map.Population); },
+        DeathsPer100k: function (map) { return per100k(map.DeathCount, map.Population); },
+        CasesPer100kRank: function (map) { return rank(COLUMNS.CasesPer100k(map)); },
+        DeathsPer100kRank: function (map) { return rank(COLUMNS.DeathsPer100k(map)); },
+        CasesPer100kPercentile: function (map) { return percentile(COLUMNS.CasesPer100k(map)); },
+        DeathsPer100kPercentile: function (map) { return percentile(COLUMNS.DeathsPer100k(map)); },
+        MortalityRatio: function (map) { return ratio(map.DeathCount, map.CaseCount); }
+    };
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        maps: {
+            display_choropleth: function (cancer, year, sex, race, tab, metric, data) {
+                var key = JSON.stringify([cancer, year, sex, race].map(function (value) {
+                    return value === undefined ? null : value;
+                }));
+                var map = data.maps[key];
+                // a map with the same counts as a less filtered one is stored as that map's key
+                if (typeof map === 'string') {
+                    map = data.maps[map];
+                }
+                var columns = data.metrics[metric] || data.metrics.count;
+                var graphs = [['cases', 'CaseCount'], ['deaths', 'DeathCount']];
+                return graphs.map(function (graph) {
+                    if ((tab || 'cases') !== graph[0]) {
+                        return window.dash_clientside.no_update;
+                    }
+                    var column = columns[graph[1]];
+                    var base = data.base;
+                    var trace = Object.assign({}, base.data[0], {
+                        locations: data.locations,
+                        hovertext: data.hovertext,
+                        hovertemplate: base.data[0].hovertemplate.replace(data.base_column + '=', column + '='),
+                        z: map ? COLUMNS[column](map) : data.locations.map(function () { return null; })
+                    });
+                    var coloraxis = Object.assign({}, base.layout.coloraxis, {colorbar: {title: {text: column}}});
+                    var layout = Object.assign({}, base.layout, {coloraxis: coloraxis});
+                    return Object.assign({}, base, {data: [trace], layout: layout});
+                });
+            }
+        }
+    });
+})();
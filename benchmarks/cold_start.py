@@ -0,0 +1,51 @@
+""" Cold start benchmark: imports the app in fresh interpreters and reports the time
+spent in each startup phase.
+
+    python benchmarks/cold_start.py --runs 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, time
+start = time.perf_counter()
+import wsgi
+ready = time.perf_counter() - start
+import startup
+print(json.dumps(dict(startup.timings, ready=ready)))
+'''
+
+
+def run_once():
+    """ start one interpreter, import the app and return its phase timings
+    :return: dict of phase name to seconds, plus 'process' for the whole run
+    """
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-W', 'ignore', '-c', CHILD], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout
+    timings = json.loads(out.strip().splitlines()[-1])
+    timings['process'] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    print("%-16s %9s %9s %9s" % ('phase', 'median', 'min', 'max'))
+    for name in runs[0]:
+        values = [run[name] for run in runs]
+        print("%-16s %8.3fs %8.3fs %8.3fs" % (name, statistics.median(values), min(values), max(values)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+""" Load test: replays a mix of dropdown changes, tab switches and email signups
+against the dashboard's _dash-update-component endpoint and reports latency percentiles.
+
+    python benchmarks/load_test.py --requests 2000 --concurrency 8
+    python benchmarks/load_test.py --url http://127.0.0.1:8050 --duration 30
+
+Without --url the app is imported and driven in-process through Flask's test client,
+writing signups to a throwaway database.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# share of each kind of interaction, roughly what the page sees
+MIX = {'select': 0.7, 'tab': 0.2, 'submit': 0.1}
+
+
+class LocalClient:
+    """ Calls the app in this process """
+
+    def __init__(self):
+        os.environ.setdefault('EMAILS_DB', os.path.join(tempfile.mkdtemp(), 'load_test.db'))
+        sys.path.insert(0, ROOT)
+        import wsgi
+        import mailing_list
+        mailing_list.init_db(mailing_list.DATABASE)
+        self.application = wsgi.application
+        self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.application.test_client()
+        return self._local.client
+
+    def get(self, path):
+        response = self._client().get(path)
+        return response.status_code, response.get_data()
+
+    def post(self, path, body):
+        response = self._client().post(path, json=body)
+        return response.status_code, response.get_data()
+
+
+class HttpClient:
+    """ Calls a running server """
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def _open(self, request):
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def get(self, path):
+        return self._open(urllib.request.Request(self.url + path))
+
+    def post(self, path, body):
+        return self._open(urllib.request.Request(self.url + path, data=json.dumps(body).encode(), method='POST',
+                                                 headers={'Content-Type': 'application/json'}))
+
+
+def find_callback(dependencies, component_id):
+    """ the callback that writes to a component
+    :param dependencies: list from /_dash-dependencies
+    :param component_id: id of one of its outputs
+    :return: dependency dict
+    """
+    for dependency in dependencies:
+        outputs = dependency['output'].strip('.').split('...')
+        if any(output.split('.')[0] == component_id for output in outputs):
+            return dependency
+    raise ValueError("no callback outputs to %s" % component_id)
+
+
+def payload(dependency, values, changed):
+    """ build the body Dash's front end would post for a callback
+    :param dependency: dependency dict
+    :param values: component id -> current value of its input or state
+    :param changed: id of the input that triggered the call, None for the initial call
+    :return: request body
+    """
+    outputs = [dict(zip(('id', 'property'), output.split('.')))
+               for output in dependency['output'].strip('.').split('...')]
+    return {
+        'output': dependency['output'],
+        'outputs': outputs if dependency['output'].startswith('..') else outputs[0],
+        'inputs': [dict(item, value=values.get(item['id'])) for item in dependency['inputs']],
+        'state': [dict(item, value=values.get(item['id'])) for item in dependency['state']],
+        'changedPropIds': [] if changed is None else
+        [item['id'] + '.' + item['property'] for item in dependency['inputs'] if item['id'] == changed],
+    }
+
+
+class Session:
+    """ One simulated visitor, keeps the dropdown and tab values between requests """
+
+    def __init__(self, maps, signup, cancer_types, rng):
+        self.maps = maps
+        self.signup = signup
+        self.cancer_types = cancer_types
+        self.rng = rng
+        self.values = {'select-cancer': None, 'map-tabs': 'cases', 'select-metric': 'count', 'submit-val': 0}
+
+    def next_request(self):
+        kind = self.rng.choices(list(MIX), weights=list(MIX.values()))[0]
+        if kind == 'select':
+            self.values['select-cancer'] = self.rng.choice(self.cancer_types)
+            return kind, payload(self.maps, self.values, 'select-cancer')
+        if kind == 'tab':
+            self.values['map-tabs'] = 'deaths' if self.values['map-tabs'] == 'cases' else 'cases'
+            return kind, payload(self.maps, self.values, 'map-tabs')
+        self.values['submit-val'] += 1
+        self.values['input-on-submit'] = 'user%d@example.com' % self.rng.randrange(10 ** 9)
+        return kind, payload(self.signup, self.values, 'submit-val')
+
+
+def find_options(component, component_id):
+    """ dropdown options of a component in the serialized layout """
+    if isinstance(component, dict):
+        props = component.get('props', {})
+        if props.get('id') == component_id:
+            return props['options']
+        children = props.get('children')
+        for child in children if isinstance(children, list) else [children]:
+            options = find_options(child, component_id)
+            if options is not None:
+                return options
+    return None
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='base url of a running server, omit to test in-process')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=1000, help='total requests, ignored with --duration')
+    parser.add_argument('--duration', type=float, help='seconds to run instead of a request count')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    client = HttpClient(args.url) if args.url else LocalClient()
+    status, body = client.get('/_dash-dependencies')
+    dependencies = json.loads(body)
+    maps = find_callback(dependencies, 'choropleth')
+    signup = find_callback(dependencies, 'container-button-basic')
+    status, body = client.get('/_dash-layout')
+    cancer_types = [option['value'] for option in find_options(json.loads(body), 'select-cancer')]
+
+    results = {kind: [] for kind in MIX}
+    errors = {kind: 0 for kind in MIX}
+    lock = threading.Lock()
+    remaining = [args.requests]
+    deadline = time.monotonic() + args.duration if args.duration else None
+
+    def worker(n):
+        session = Session(maps, signup, cancer_types, random.Random(args.seed + n))
+        # first paint, like a browser opening the page
+        client.post('/_dash-update-component', payload(maps, session.values, None))
+        while True:
+            with lock:
+                if deadline is None:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            kind, body = session.next_request()
+            start = time.perf_counter()
+            status, _ = client.post('/_dash-update-component', body)
+            seconds = time.perf_counter() - start
+            with lock:
+                results[kind].append(seconds)
+                if status not in (200, 204):
+                    errors[kind] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(worker, range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    everything = [seconds for values in results.values() for seconds in values]
+    print("%d requests in %.2fs, %.1f req/s, concurrency %d"
+          % (len(everything), elapsed, len(everything) / elapsed, args.concurrency))
+    print("%-8s %7s %9s %9s %9s %7s" % ('kind', 'count', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'))
+    for kind, values in list(results.items()) + [('all', everything)]:
+        if values:
+            print("%-8s %7d %9.2f %9.2f %9.2f %7d" % (
+                kind, len(values), percentile(values, 50) * 1000, percentile(values, 95) * 1000,
+                percentile(values, 99) * 1000, errors.get(kind, sum(errors.values()))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+""" Microbenchmarks for the map callback, the bar chart aggregation and the email inserts.
+
+    python benchmarks/micro.py --number 200
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextvars
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('EMAILS_DB', os.path.join(tempfile.mkdtemp(), 'micro.db'))
+
+
+def measure(name, function, number):
+    """ run a function number times and print the mean and best time per call """
+    times = []
+    for _ in range(number):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    print("%-40s %10.3f ms %10.3f ms" % (name, sum(times) / len(times) * 1000, min(times) * 1000))
+
+
+def in_callback(triggered, function, *args):
+    """ call a Dash callback outside of a request, as if the given input had changed """
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+
+    def run():
+        context_value.set(AttributeDict(triggered_inputs=[{'prop_id': triggered, 'value': None}]))
+        return function(*args)
+    return contextvars.copy_context().run(run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=100)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    import wsgi
+    import cancer_data
+    import data_cube
+    import figure_cache
+    import mailing_list
+    dashboard = wsgi.dashboard
+    cube, version = data_cube.current()
+    cancer_types = cube.data.cancer_types
+    n = args.number
+    print("%-40s %13s %13s" % ('benchmark', 'mean', 'best'))
+
+    cycle = iter(range(10 ** 9))
+    measure('display_choropleth, dropdown change', lambda: in_callback(
+        'select-cancer.value', dashboard.display_choropleth,
+        cancer_types[next(cycle) % len(cancer_types)], None, None, None, 'cases'), n)
+    measure('display_choropleth, tab switch', lambda: in_callback(
+        'map-tabs.value', dashboard.display_choropleth,
+        cancer_types[next(cycle) % len(cancer_types)], None, None, None, 'deaths'), n)
+    measure('build_choropleth (uncached plotly express)', lambda: figure_cache.build_choropleth(
+        cube.map_rows(cancer_types[next(cycle) % len(cancer_types)]), 'CaseCount'), max(n // 10, 1))
+
+    data = cancer_data.load()
+    measure('bar chart totals, groupby', lambda: data.df.groupby(['CancerType'], observed=True)[
+        ['CaseCount', 'DeathCount']].sum().reset_index(), n)
+    measure('bar chart totals, cube lookup', lambda: dashboard.bar_chart(cube.totals()), n)
+    measure('data_cube.Cube build', lambda: data_cube.Cube(data), max(n // 10, 1))
+
+    mailing_list.init_db(mailing_list.DATABASE)
+    conn = mailing_list.create_connection(mailing_list.DATABASE)
+    measure('create_email, one commit each', lambda: mailing_list.create_email(
+        conn, ('micro%d@example.com' % next(cycle), '2017-01-01')), n)
+    measure('create_emails, batch of 100', lambda: mailing_list.create_emails(
+        conn, [('micro%d@example.com' % next(cycle), '2017-01-01') for _ in range(100)]), n)
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import os
+import pandas as pd
+
+DATA_FILE = 'Compiled data.csv'
+# Parquet store written by ingest.py, used instead of DATA_FILE once it exists
+DATA_STORE = os.environ.get('DATA_STORE', 'data_store')
+# comma separated years the dashboard reads from the store, all of them if unset
+DATA_YEARS = [int(year) for year in os.environ['DATA_YEARS'].split(',')] if os.environ.get('DATA_YEARS') else None
+# rewritten by ingest.py after every append, parquet readers skip names starting with _
+VERSION_FILE = '_version'
+
+# compact column types, the csv holds 'Na' where a count was suppressed
+DTYPES = {
+    'Area': 'category',
+    'CancerType': 'category',
+    'Year': 'int16',
+    'Sex': 'category',
+    'Race': 'category',
+    'AgeAdjustedRate': 'float32',
+    'CaseCount': 'Int32',
+    'Population': 'int32',
+    'DeathCount': 'Int32',
+    'Code': 'category',
+}
+
+
+def data_version(file=DATA_FILE, store=DATA_STORE):
+    """ return a key that changes whenever the data file is rewritten or the store is appended to
+    :param file: path of the csv file
+    :param store: path of the store folder
+    :return: tuple of (modified time, size) of every file it checked
+    """
+    if os.path.isdir(store):
+        marker = os.path.join(store, VERSION_FILE)
+        if os.path.exists(marker):
+            # called on every callback, one stat instead of walking a store that grows with each append
+            paths = [marker]
+        else:
+            paths = sorted(os.path.join(folder, name) for folder, _, names in os.walk(store) for name in names)
+    else:
+        paths = [file]
+    return tuple((st.st_mtime_ns, st.st_size) for st in map(os.stat, paths))
+
+
+class CancerData:
+    """ Typed copy of the compiled data and the cancer types it holds, the per cancer type lookups
+    are served by data_cube.Cube
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.cancer_types = df['CancerType'].cat.remove_unused_categories().cat.categories.tolist()
+
+
+def read_store(store=DATA_STORE, years=None):
+    """ read the Parquet store, only opening the Year folders asked for
+    :param store: path of the store folder
+    :param years: list of years to read, None for all
+    :return: DataFrame with the same columns and types as the csv
+    """
+    filters = None if years is None else [('Year', 'in', [int(year) for year in years])]
+    df = pd.read_parquet(store, filters=filters)
+    return df[list(DTYPES)].astype(DTYPES)
+
+
+def load(file=DATA_FILE, store=DATA_STORE, years=DATA_YEARS):
+    """ parse the data into a CancerData, from the store if there is one, else the csv
+    :param file: path of the csv file
+    :param store: path of the store folder
+    :param years: list of years to read from the store, None for all
+    :return: CancerData object
+    """
+    if os.path.isdir(store):
+        df = read_store(store, years)
+    else:
+        df = pd.read_csv(file, dtype=DTYPES, na_values=['Na'])
+    df = df.dropna(subset=['CancerType'])
+    return CancerData(df)
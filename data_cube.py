@@ -0,0 +1,114 @@
+import threading
+from itertools import combinations
+import cancer_data
+import derived_metrics
+
+# filters the dashboard offers on top of the cancer type, None means all values summed
+DIMENSIONS = ['Year', 'Sex', 'Race']
+# values the CDC uses for rows that already total a dimension's breakdown
+TOTAL_LABELS = {'Sex': 'Male and Female', 'Race': 'All Races'}
+COUNT_COLUMNS = ['CaseCount', 'DeathCount', 'Population']
+
+_lock = threading.Lock()
+# (Cube, data version) swapped as one value so readers never see a mismatched pair
+_current = (None, None)
+
+
+class Cube:
+    """ Counts and derived metrics pre-aggregated for every combination of filters, so a dropdown
+    change is a dict lookup instead of a groupby
+    """
+
+    def __init__(self, data):
+        self.data = data
+        df = data.df
+        self._maps = {}
+        self._totals = {}
+        for n in range(len(DIMENSIONS) + 1):
+            for kept in combinations(DIMENSIONS, n):
+                kept = list(kept)
+                summed = self._most_aggregated(df, kept)
+                # min_count keeps a state missing, not zero, when all of its counts were suppressed
+                rows = summed.groupby(['CancerType'] + kept + ['Area', 'Code'], observed=True)[COUNT_COLUMNS]\
+                    .sum(min_count=1).reset_index()
+                rows = derived_metrics.add_metrics(rows, ['CancerType'] + kept)
+                for key, group in rows.groupby(['CancerType'] + kept, observed=True):
+                    self._maps[(str(key[0]),) + self._key(kept, key[1:])] = group.reset_index(drop=True)
+
+                totals = summed.groupby(kept + ['CancerType'], observed=True)[COUNT_COLUMNS].sum().reset_index()
+                if kept:
+                    for key, group in totals.groupby(kept, observed=True):
+                        self._totals[self._key(kept, key)] = group.reset_index(drop=True)
+                else:
+                    self._totals[self._key(kept, ())] = totals
+        self._empty = rows.iloc[0:0][list(dict.fromkeys(['Area', 'Code'] + COUNT_COLUMNS + derived_metrics.metric_columns()))]
+        self._no_totals = totals.iloc[0:0][['CancerType'] + COUNT_COLUMNS]
+
+    @staticmethod
+    def _most_aggregated(df, kept):
+        """ keep, for each cancer type, state and year, only the rows of the most aggregated level of
+        the dimensions that are summed over, so a count is never added to a total that includes it;
+        e.g. 'Male and Female/All Races' wins over 'Male/All Races', which wins over 'Male/White'
+        :param df: DataFrame of counts
+        :param kept: dimensions filtered on, the others in TOTAL_LABELS are summed over
+        :return: DataFrame
+        """
+        summed = [dimension for dimension in TOTAL_LABELS if dimension not in kept]
+        if not summed:
+            return df
+        # more dimensions at their total label ranks higher, ties are broken the same way everywhere
+        level = sum((df[dimension] == TOTAL_LABELS[dimension]).astype('int8') * (1 << i)
+                    for i, dimension in enumerate(summed))
+        totaled = sum((df[dimension] == TOTAL_LABELS[dimension]).astype('int8') for dimension in summed)
+        rank = totaled * (1 << len(summed)) + level
+        group = ['CancerType', 'Area', 'Year'] + [dimension for dimension in TOTAL_LABELS if dimension in kept]
+        best = rank.groupby([df[column] for column in group], observed=True).transform('max')
+        return df[rank == best]
+
+    @staticmethod
+    def _key(kept, values):
+        # plain python values, numpy scalars from groupby would not survive json
+        filters = {dimension: getattr(value, 'item', lambda: value)() for dimension, value in zip(kept, values)}
+        return tuple(filters.get(dimension) for dimension in DIMENSIONS)
+
+    def map_rows(self, cancer, year=None, sex=None, race=None):
+        """ look up the per state counts of one cancer type
+        :param cancer: CancerType value
+        :param year: Year to keep, None for all years summed
+        :param sex: Sex to keep, None for all
+        :param race: Race to keep, None for all
+        :return: DataFrame with one row per state, empty if nothing matches
+        """
+        return self._maps.get((cancer, year, sex, race), self._empty)
+
+    def map_items(self):
+        """ every (cancer, year, sex, race) key with its per state rows
+        :return: iterator of (key, DataFrame) pairs
+        """
+        return iter(self._maps.items())
+
+    def totals(self, year=None, sex=None, race=None):
+        """ look up the national counts of every cancer type
+        :return: DataFrame with one row per cancer type
+        """
+        return self._totals.get((year, sex, race), self._no_totals)
+
+    def options(self, dimension):
+        """ values a filter dropdown can offer
+        :param dimension: one of DIMENSIONS
+        :return: sorted list of values present in the data
+        """
+        return sorted(self.data.df[dimension].unique().tolist())
+
+
+def current():
+    """ return the cube of the current data, rebuilding it after the data changed
+    :return: (Cube, data version) tuple
+    """
+    global _current
+    version = cancer_data.data_version()
+    if version != _current[1]:
+        with _lock:
+            if version != _current[1]:
+                _current = (Cube(cancer_data.load()), version)
+    return _current
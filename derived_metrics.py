@@ -0,0 +1,62 @@
+""" Per-capita rates, state ranks, percentiles and the mortality ratio, computed with whole-column
+numpy operations when the data cube is built so the maps only look them up.
+"""
+import numpy as np
+
+# map metric -> column shown on the CASES map and on the DEATHS map
+METRIC_COLUMNS = {
+    'count': {'CaseCount': 'CaseCount', 'DeathCount': 'DeathCount'},
+    'per100k': {'CaseCount': 'CasesPer100k', 'DeathCount': 'DeathsPer100k'},
+    'rank': {'CaseCount': 'CasesPer100kRank', 'DeathCount': 'DeathsPer100kRank'},
+    'percentile': {'CaseCount': 'CasesPer100kPercentile', 'DeathCount': 'DeathsPer100kPercentile'},
+    'mortality': {'CaseCount': 'MortalityRatio', 'DeathCount': 'MortalityRatio'},
+}
+
+METRIC_LABELS = {
+    'count': 'Count',
+    'per100k': 'Per 100,000 people',
+    'rank': 'Rank among states (1 = highest rate)',
+    'percentile': 'Percentile among states',
+    'mortality': 'Deaths per case',
+}
+
+RATES = {'CasesPer100k': 'CaseCount', 'DeathsPer100k': 'DeathCount'}
+
+
+def map_column(column, metric):
+    """ the column to color a map by
+    :param column: 'CaseCount' or 'DeathCount', the map's tab
+    :param metric: key of METRIC_COLUMNS, None for the raw count
+    :return: column name
+    """
+    return METRIC_COLUMNS.get(metric or 'count', METRIC_COLUMNS['count'])[column]
+
+
+def metric_columns():
+    """ every column a map can be colored by """
+    return sorted({column for columns in METRIC_COLUMNS.values() for column in columns.values()})
+
+
+def _floats(series):
+    return series.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def add_metrics(rows, group):
+    """ add the derived columns to a frame of per state counts, in one pass over all groups
+    :param rows: DataFrame with CaseCount, DeathCount and Population, one row per state and group
+    :param group: columns that identify one map, ranks and percentiles are computed within each
+    :return: the same DataFrame with the metric columns added
+    """
+    population = _floats(rows['Population'])
+    population[population == 0] = np.nan
+    for rate, count in RATES.items():
+        rows[rate] = (_floats(rows[count]) / population * 100000).astype('float32')
+    cases = _floats(rows['CaseCount'])
+    cases[cases == 0] = np.nan
+    rows['MortalityRatio'] = (_floats(rows['DeathCount']) / cases).astype('float32')
+
+    grouped = rows.groupby(group, observed=True, sort=False)
+    for rate in RATES:
+        rows[rate + 'Rank'] = grouped[rate].rank(method='min', ascending=False).astype('Int16')
+        rows[rate + 'Percentile'] = (grouped[rate].rank(pct=True) * 100).astype('float32')
+    return rows
@@ -0,0 +1,222 @@
+""" Write a digest email for every subscriber on the mailing list into a Maildir outbox.
+
+    python digest.py --outbox outbox --jobs 4
+
+The figures are computed once from the dashboard's data cube and shared with the
+worker processes, which only fill in each subscriber's details. Messages land in
+outbox/new for a local SMTP relay to pick up. Progress is saved after every chunk,
+so running the same digest again continues where an interrupted run stopped.
+"""
+import os
+import json
+import html
+import argparse
+from datetime import date
+from collections import deque
+from email.message import EmailMessage
+from email.utils import formatdate
+from concurrent.futures import ProcessPoolExecutor
+import mailing_list
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SENDER = os.environ.get('DIGEST_FROM', 'Cancer Statistics <digest@localhost>')
+# colors of the cases and deaths bars on the dashboard
+COLORS = {'CaseCount': '#FFD700', 'DeathCount': '#CD7F32'}
+# subscribers rendered by one worker task
+CHUNK_SIZE = 1000
+# stand-ins for the subscriber's details in the message template of a chunk
+EMAIL_TOKEN = '@@email@@'
+DATE_TOKEN = '@@date@@'
+
+# shared digest content, set in each worker by _init_worker
+_content = None
+
+
+def digest_content(cube, top=5):
+    """ the parts of the digest that are the same for every subscriber
+    :param cube: data_cube.Cube
+    :param top: number of cancer types and states to list
+    :return: dict of plain strings, cheap to send to worker processes
+    """
+    totals = cube.totals().sort_values('CaseCount', ascending=False).head(top)
+    leader = str(totals['CancerType'].iloc[0])
+    states = cube.map_rows(leader).sort_values('CasesPer100kRank').head(top)
+
+    widest = max(int(totals['CaseCount'].max()), 1)
+    text = ["Most diagnosed cancer types in the United States:", ""]
+    rows = []
+    for _, row in totals.iterrows():
+        text.append("  %-35s %10s cases %10s deaths" % (row['CancerType'], format(int(row['CaseCount']), ','),
+                                                         format(int(row['DeathCount']), ',')))
+        bars = ''.join('\n<div style="background:%s;height:10px;width:%d%%"></div>'
+                       % (COLORS[column], max(int(row[column]) * 100 // widest, 1)) for column in COLORS)
+        rows.append('<tr><td>%s</td><td align="right">%s</td><td align="right">%s</td>\n<td width="40%%">%s</td></tr>\n'
+                    % (html.escape(str(row['CancerType'])), format(int(row['CaseCount']), ','),
+                       format(int(row['DeathCount']), ','), bars))
+    text += ["", "States with the highest rate of %s:" % leader, ""]
+    state_items = []
+    for _, row in states.iterrows():
+        text.append("  %d. %s, %.1f cases per 100,000 people" % (row['CasesPer100kRank'], row['Area'],
+                                                                row['CasesPer100k']))
+        state_items.append('<li>%s, %.1f cases per 100,000 people</li>\n' % (html.escape(str(row['Area'])),
+                                                                          row['CasesPer100k']))
+    return {
+        'text': '\n'.join(text),
+        'html': '<table cellpadding="4">\n<tr><th align="left">Cancer type</th><th>Cases</th><th>Deaths</th>'
+                '<th></th></tr>\n%s</table>\n<p>States with the highest rate of %s:</p>\n<ol>\n%s</ol>\n'
+                % (''.join(rows), html.escape(leader), ''.join(state_items)),
+        'subject': 'Cancer statistics digest: %s leads with %s cases'
+                   % (leader, format(int(totals['CaseCount'].iloc[0]), ',')),
+    }
+
+
+def render(content, email, signed_up):
+    """ build one subscriber's message
+    :param content: dict from digest_content
+    :param email: address
+    :param signed_up: signup date as stored, may be None
+    :return: EmailMessage
+    """
+    since = "You signed up on %s. " % signed_up if signed_up else ""
+    message = EmailMessage()
+    message['From'] = SENDER
+    message['To'] = email
+    message['Subject'] = content['subject']
+    message['Date'] = formatdate(localtime=True)
+    # 8bit keeps every line as written, so the template's stand-ins are never split by an encoding
+    message.set_content("Hello %s,\n\n%s\n\n%sReply to unsubscribe.\n" % (email, content['text'], since),
+                        cte='8bit')
+    message.add_alternative('<html><body>\n<p>Hello %s,</p>\n%s<p>%sReply to unsubscribe.</p>\n</body></html>\n'
+                            % (html.escape(email), content['html'], html.escape(since)), subtype='html', cte='8bit')
+    return message
+
+
+def maildir(outbox):
+    for folder in ('tmp', 'new', 'cur'):
+        os.makedirs(os.path.join(outbox, folder), exist_ok=True)
+
+
+def _init_worker(content, outbox, name):
+    global _content
+    _content = (content, outbox, name)
+
+
+def write_chunk(rows):
+    """ write the messages of one chunk of subscribers, runs in a worker process
+    :param rows: list of (id, email, date) tuples
+    :return: (last id, number of messages written, number of rows skipped)
+    """
+    content, outbox, name = _content
+    # building a message is most of the cost, so build one per chunk and fill in each subscriber
+    template = render(content, EMAIL_TOKEN, DATE_TOKEN).as_bytes()
+    written = skipped = 0
+    for email_id, email, signed_up in rows:
+        # rows from before signups were validated may hold anything, they must not reach a header
+        if not mailing_list.valid_email(email):
+            skipped += 1
+            continue
+        if signed_up and email.isascii() and html.escape(email) == email and '@@' not in email:
+            data = template.replace(EMAIL_TOKEN.encode(), email.encode()).replace(DATE_TOKEN.encode(),
+                                                                                  str(signed_up).encode())
+        else:
+            try:
+                data = render(content, email, signed_up).as_bytes()
+            except ValueError as e:
+                print(e)
+                skipped += 1
+                continue
+        # the same file name on every run, so a resumed digest replaces instead of duplicating
+        filename = '%s.%d.eml' % (name, email_id)
+        tmp = os.path.join(outbox, 'tmp', filename)
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, os.path.join(outbox, 'new', filename))
+        written += 1
+    return rows[-1][0], written, skipped
+
+
+def read_checkpoint(path, name):
+    """ id of the last subscriber done by an earlier run of the same digest, 0 to start over """
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    return checkpoint['after_id'] if checkpoint.get('digest') == name else 0
+
+
+def save_checkpoint(path, name, after_id):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'digest': name, 'after_id': after_id}, f)
+    os.replace(tmp, path)
+
+
+def run(conn, content, outbox, name, jobs=None, chunk_size=CHUNK_SIZE):
+    """ write the digest for every subscriber after the checkpoint
+    :param conn: connection to the mailing list
+    :param content: dict from digest_content
+    :param outbox: Maildir folder
+    :param name: digest name, part of every file name and of the checkpoint
+    :param jobs: worker processes, None for one per cpu
+    :param chunk_size: subscribers per worker task
+    :return: (number of messages written, number of invalid addresses skipped)
+    """
+    maildir(outbox)
+    checkpoint = os.path.join(outbox, 'digest.checkpoint')
+    read_after = read_checkpoint(checkpoint, name)
+    written = skipped = 0
+    jobs = jobs or os.cpu_count()
+    with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(content, outbox, name)) as pool:
+        # a few chunks in flight per worker, the rest of the list stays in the database
+        in_flight = jobs * 2
+        pending = deque()
+        done_reading = False
+        while True:
+            while not done_reading and len(pending) < in_flight:
+                rows = mailing_list.page_emails(conn, read_after, chunk_size)
+                if rows:
+                    read_after = rows[-1][0]
+                    pending.append(pool.submit(write_chunk, rows))
+                done_reading = len(rows) < chunk_size
+            if not pending:
+                return written, skipped
+            # chunks are saved in list order, so the checkpoint never skips an unfinished one
+            last_id, count, bad = pending.popleft().result()
+            written += count
+            skipped += bad
+            save_checkpoint(checkpoint, name, last_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help='mailing list database, default EMAILS_DB or SQLDatabase.db')
+    parser.add_argument('--outbox', default='outbox', help='Maildir folder to write to')
+    parser.add_argument('--name', default=date.today().isoformat(),
+                        help='digest name, a new name starts over instead of resuming')
+    parser.add_argument('--jobs', type=int, help='worker processes, default one per cpu')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--top', type=int, default=5, help='cancer types and states to list')
+    args = parser.parse_args()
+
+    outbox = os.path.abspath(args.outbox)
+    database = os.path.abspath(args.database) if args.database else None
+    # data paths are relative to the project folder, like in the app
+    os.chdir(HERE)
+    import data_cube
+    database = database or mailing_list.DATABASE
+    mailing_list.init_db(database)
+    conn = mailing_list.create_connection(database)
+    if conn is None:
+        print("Error! cannot create the database connection.")
+        return
+    cube, version = data_cube.current()
+    try:
+        count, skipped = run(conn, digest_content(cube, args.top), outbox, args.name, args.jobs, args.chunk_size)
+    finally:
+        conn.close()
+    print("wrote %d messages to %s, skipped %d invalid addresses" % (count, os.path.join(outbox, 'new'), skipped))
+
+
+if __name__ == '__main__':
+    main()
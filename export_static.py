@@ -0,0 +1,98 @@
+""" Pre-render the dashboard into static files that any web server can serve.
+
+    python export_static.py --out build
+
+The page is exported in CLIENTSIDE_MAPS mode so map changes need no server. The
+Dash app is still needed behind /_dash-update-component for the email form and the
+bar chart filters; build/nginx.conf shows how to serve the rest and proxy that path.
+Every map (cancer type x cases/deaths) and the bar chart are also written to
+build/figures as plotly JSON and standalone HTML.
+"""
+import os
+import re
+import json
+import shutil
+import argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+NGINX_CONF = '''server {
+    listen 80;
+    root %(root)s;
+
+    location = / { try_files /index.html =404; }
+    location = /_dash-layout { default_type application/json; }
+    location = /_dash-dependencies { default_type application/json; }
+    location /_dash-component-suites/ { expires 1y; }
+    location /figures/ { expires 1h; }
+
+    # the email form and the bar chart filters still run in the app
+    location = /_dash-update-component { proxy_pass http://127.0.0.1:8050; }
+}
+'''
+
+
+def slug(text):
+    return re.sub('[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data if isinstance(data, bytes) else data.encode())
+
+
+def export_page(client, out):
+    """ save the index page, layout, callback list and every script the page loads
+    :param client: Flask test client of the app
+    :param out: output folder
+    """
+    index = client.get('/').get_data(as_text=True)
+    write(os.path.join(out, 'index.html'), index)
+    for path in ('_dash-layout', '_dash-dependencies'):
+        write(os.path.join(out, path), client.get('/' + path).get_data())
+    for url in re.findall(r'src="/(_dash-component-suites/[^"?]+)', index):
+        write(os.path.join(out, url), client.get('/' + url).get_data())
+    shutil.copytree(os.path.join(HERE, 'assets'), os.path.join(out, 'assets'), dirs_exist_ok=True)
+
+
+def export_figures(dashboard, out):
+    """ save every map and the bar chart as plotly JSON and HTML
+    :param dashboard: the loaded dashboard module
+    :param out: output folder
+    :return: number of figures written
+    """
+    import plotly.io as pio
+    import data_cube
+    import figure_cache
+    cube = data_cube.current()[0]
+    figures = {'cases-vs-deaths': dashboard.bar_chart(cube.totals())}
+    for cancer in cube.data.cancer_types:
+        for tab, (graph, column) in dashboard.MAP_TABS.items():
+            figures[slug(cancer) + '-' + tab] = figure_cache.get_figure(cancer, column)
+    for name, figure in figures.items():
+        write(os.path.join(out, 'figures', name + '.json'), json.dumps(figure))
+        write(os.path.join(out, 'figures', name + '.html'),
+              pio.to_html(figure, include_plotlyjs='cdn', full_html=True))
+    write(os.path.join(out, 'figures', 'index.json'), json.dumps(sorted(figures)))
+    return len(figures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', default='build')
+    args = parser.parse_args()
+
+    out = os.path.abspath(args.out)
+    os.environ['CLIENTSIDE_MAPS'] = '1'
+    os.environ['EAGER_LOADING'] = '1'
+    import wsgi
+    client = wsgi.application.test_client()
+    export_page(client, out)
+    count = export_figures(wsgi.dashboard, out)
+    write(os.path.join(out, 'nginx.conf'), NGINX_CONF % {'root': out})
+    print("wrote the page and %d figures to %s" % (count, out))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+import os
+import json
+import threading
+import pandas as pd
+import data_cube
+import derived_metrics
+import shared_cache
+import telemetry
+
+MAP_COLUMNS = ['CaseCount', 'DeathCount']
+
+_lock = threading.Lock()
+_version = None
+# column -> map without any states, carries the layout and is sent to a browser once
+_bases = {}
+# (cancer, column, year, sex, race) -> per state arrays, the only part that changes with the dropdowns
+_traces = {}
+# traces a worker keeps in its own memory when the shared cache holds the full set
+TRACE_LIMIT = int(os.environ.get('TRACE_LIMIT', 2000))
+
+
+def build_choropleth(rows, column):
+    """ build the US map of one column for the selected cancer type
+    :param rows: DataFrame with one row per state
+    :param column: 'CaseCount', 'DeathCount' or a derived metric column
+    :return: figure as a plain dict, ready to be sent to the browser
+    """
+    # plotly express takes about as long to import as the rest of the app, so wait for the first map
+    import plotly.express as px
+    new_df = rows.sort_values(by=[column], ascending=[False])
+    fig = px.choropleth(new_df, locations='Code', locationmode='USA-states', color_continuous_scale='deep',
+                        color=column, hover_name='Area')
+
+    fig.update_layout(
+        geo_scope='usa',
+        height=700,
+        paper_bgcolor='#567ca7',
+        font={'color': 'white'},
+        geo=dict(showlakes=True, lakecolor='rgb(255,255,255)')
+    )
+    # serialize once here so every request reuses the plain json structure
+    return json.loads(fig.to_json())
+
+
+def z_values(series):
+    """ json friendly values of a map column, missing values become None
+    :param series: column of counts or metrics
+    :return: list of int, float or None
+    """
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return [None if pd.isna(value) else int(value) for value in series.tolist()]
+    return [None if pd.isna(value) else round(float(value), 4) for value in series.tolist()]
+
+
+def map_trace(rows, column):
+    """ pull out the arrays a map needs from the rows of one cancer type
+    :param rows: DataFrame with one row per state
+    :param column: 'CaseCount', 'DeathCount' or a derived metric column
+    :return: dict of locations, z and hovertext lists
+    """
+    return {
+        'locations': rows['Code'].tolist(),
+        'z': z_values(rows[column]),
+        'hovertext': rows['Area'].tolist(),
+    }
+
+
+def _current_traces():
+    global _version, _traces
+    cube, version = data_cube.current()
+    if version != _version:
+        with _lock:
+            if version != _version:
+                _traces = {}
+                _version = version
+    return cube, version, _traces
+
+
+def get_base(column):
+    """ return the empty map for a column, it does not depend on the data; looked up in the
+    shared cache before it is built with plotly
+    :param column: 'CaseCount', 'DeathCount' or a derived metric column
+    :return: figure dict
+    """
+    base = _bases.get(column)
+    result = 'hit'
+    if base is None:
+        cube, version, traces = _current_traces()
+        base = shared_cache.get(version, ['base', column])
+        result = 'miss' if base is None else 'shared'
+        if base is None:
+            base = build_choropleth(cube.map_rows(None), column)
+            shared_cache.put(version, ['base', column], base)
+        _bases[column] = base
+    telemetry.count('figure_cache_requests_total', cache='base', result=result)
+    return base
+
+
+def get_trace(cancer, column, year=None, sex=None, race=None):
+    """ return the cached per state arrays for a cancer type and filters, building them on first use;
+    the cache is dropped when the data changes
+    :param cancer: CancerType value from the dropdown
+    :param column: 'CaseCount', 'DeathCount' or a derived metric column
+    :param year: Year filter, None for all
+    :param sex: Sex filter, None for all
+    :param race: Race filter, None for all
+    :return: dict of locations, z and hovertext lists
+    """
+    cube, version, traces = _current_traces()
+    key = (cancer, column, year, sex, race)
+    trace = traces.get(key)
+    result = 'hit'
+    if trace is None:
+        rows = cube.map_rows(cancer, year, sex, race)
+        if not len(rows):
+            # the values come from the request, so only combinations that exist in the data are kept
+            telemetry.count('figure_cache_requests_total', cache='trace', result='empty')
+            return map_trace(rows, column)
+        trace = shared_cache.get(version, ['trace'] + list(key))
+        result = 'miss' if trace is None else 'shared'
+        if trace is None:
+            trace = map_trace(rows, column)
+            shared_cache.put(version, ['trace'] + list(key), trace)
+        if shared_cache.enabled() and len(traces) >= TRACE_LIMIT:
+            # the shared cache has the rest, so drop the oldest instead of growing with every filter combination
+            traces.pop(next(iter(traces)), None)
+        traces[key] = trace
+    telemetry.count('figure_cache_requests_total', cache='trace', result=result)
+    return trace
+
+
+def get_figure(cancer, column, year=None, sex=None, race=None):
+    """ return the complete map for a cancer type and filters
+    :return: figure dict
+    """
+    base = get_base(column)
+    figure = dict(base)
+    figure['data'] = [dict(base['data'][0], **get_trace(cancer, column, year, sex, race))]
+    return figure
+
+
+def _parent(key):
+    # the same map with its last filter cleared
+    filters = list(key[1:])
+    for i in reversed(range(len(filters))):
+        if filters[i] is not None:
+            filters[i] = None
+            return (key[0],) + tuple(filters)
+    return None
+
+
+def client_data():
+    """ everything the browser needs to draw any map without calling the server, used by the
+    CLIENTSIDE_MAPS mode; every state is listed once, each map is only its counts and the derived
+    metrics are computed in assets/maps.js
+    :return: dict with one base figure, state codes and names, the metric columns, and count lists
+        keyed by the json encoded [cancer, year, sex, race]; a map with the same counts as the map
+        without its last filter is the encoded key of that map instead
+    """
+    cube, version = data_cube.current()
+    states = cube.data.df[['Code', 'Area']].drop_duplicates('Code').sort_values('Code')
+    codes = states['Code'].tolist()
+    counts = {}
+    for key, rows in cube.map_items():
+        rows = rows.set_index('Code').reindex(codes)
+        counts[key] = {column: z_values(rows[column].astype('Int64')) for column in data_cube.COUNT_COLUMNS}
+    maps = {}
+    resolved = {}
+    # parents have fewer filters, so they are resolved before their children
+    for key in sorted(counts, key=lambda key: sum(value is not None for value in key)):
+        name = json.dumps(key, separators=(',', ':'))
+        parent = _parent(key)
+        if parent in resolved and counts[parent] == counts[key]:
+            resolved[key] = resolved[parent]
+            maps[name] = resolved[key]
+        else:
+            resolved[key] = name
+            maps[name] = counts[key]
+    return {
+        'base': get_base('CaseCount'),
+        'base_column': 'CaseCount',
+        'metrics': derived_metrics.METRIC_COLUMNS,
+        'locations': codes,
+        'hovertext': states['Area'].tolist(),
+        'maps': maps,
+    }
+
+
+def warm():
+    """ build the unfiltered map of every cancer type now instead of on the first requests
+    """
+    cube, version = data_cube.current()
+    for column in MAP_COLUMNS:
+        get_base(column)
+        for cancer in cube.data.cancer_types:
+            get_trace(cancer, column)
+
+
+def warm_shared():
+    """ fill the shared cache with every map of the current data, then drop older data versions;
+    entries already there are skipped, so it is cheap to run again
+    :return: (data version, number of entries written)
+    """
+    cube, version = data_cube.current()
+    stored = shared_cache.keys(version)
+    columns = derived_metrics.metric_columns()
+    items = []
+    for column in columns:
+        if shared_cache.entry_key(['base', column]) not in stored:
+            items.append((['base', column], build_choropleth(cube.map_rows(None), column)))
+    for (cancer, year, sex, race), rows in cube.map_items():
+        for column in columns:
+            key = ['trace', cancer, column, year, sex, race]
+            if shared_cache.entry_key(key) not in stored:
+                items.append((key, map_trace(rows, column)))
+    shared_cache.put_many(version, items)
+    shared_cache.prune(version)
+    return version, len(items)
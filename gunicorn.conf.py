@@ -0,0 +1,43 @@
+import gc
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+
+bind = os.environ.get('BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('THREADS', 2))
+timeout = 30
+
+# load the data and build the figures once in the master, workers share them copy-on-write
+preload_app = True
+# seconds between data checks of the process that keeps the shared figure cache warm, 0 turns it off
+warm_interval = float(os.environ.get('WARM_INTERVAL', 30))
+# every process saves its metrics here so /metrics reports the whole server, see telemetry.py
+telemetry_dir = None
+if not os.environ.get('TELEMETRY_DIR'):
+    telemetry_dir = os.environ['TELEMETRY_DIR'] = tempfile.mkdtemp(prefix='dashboard-metrics-')
+
+
+def on_starting(server):
+    import wsgi
+    wsgi.init()
+    # keep the preloaded objects out of the collector so it does not touch their pages after fork
+    gc.freeze()
+
+
+def when_ready(server):
+    # a separate process, a thread in the master would be copied into every forked worker mid-work
+    if warm_interval and os.environ.get('SHARED_CACHE', 'figure_cache.db'):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'warm_cache.py')
+        server.warmer = subprocess.Popen([sys.executable, script, '--watch', str(warm_interval)])
+
+
+def on_exit(server):
+    warmer = getattr(server, 'warmer', None)
+    if warmer is not None:
+        warmer.terminate()
+    if telemetry_dir is not None:
+        shutil.rmtree(telemetry_dir, ignore_errors=True)
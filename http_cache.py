@@ -0,0 +1,28 @@
+import importlib.util
+import flask
+
+# GET endpoints whose body only changes on deploy, answered with 304 when the browser's copy is current
+CONDITIONAL_ENDPOINTS = ['', '_dash-layout', '_dash-dependencies']
+
+
+def enable(app):
+    """ add ETags and conditional responses to the page endpoints and compress responses
+    when flask_compress is installed
+    :param app: Dash app
+    """
+    if importlib.util.find_spec('flask_compress') is not None:
+        from flask_compress import Compress
+        app.server.config.setdefault('COMPRESS_MIMETYPES', ['text/html', 'application/json', 'text/css',
+                                                            'application/javascript'])
+        Compress(app.server)
+
+    paths = {app.config.requests_pathname_prefix + endpoint for endpoint in CONDITIONAL_ENDPOINTS}
+
+    @app.server.after_request
+    def add_etag(response):
+        if flask.request.method == 'GET' and flask.request.path in paths and response.status_code == 200 \
+                and not response.direct_passthrough:
+            response.add_etag()
+            response.headers['Cache-Control'] = 'no-cache'
+            response.make_conditional(flask.request)
+        return response
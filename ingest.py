@@ -0,0 +1,113 @@
+""" Append new CDC extracts to the columnar data store read by the dashboard.
+
+    python ingest.py "Compiled data.csv" new_extract.csv --store data_store
+
+Files are read in chunks, rows that fail validation or whose
+(Area, CancerType, Year, Sex, Race) key is already stored are skipped, and the rest
+are written as new Parquet files under one Year=<year> folder per year.
+"""
+import os
+import time
+import argparse
+import pandas as pd
+import cancer_data
+
+KEY = ['Area', 'CancerType', 'Year', 'Sex', 'Race']
+TEXT_COLUMNS = ['Area', 'CancerType', 'Sex', 'Race', 'Code']
+COUNT_COLUMNS = ['CaseCount', 'Population', 'DeathCount']
+CHUNK_SIZE = 100000
+
+
+def stored_keys(store):
+    """ read the keys already in the store
+    :param store: path of the store folder
+    :return: set of key tuples
+    """
+    if not os.path.isdir(store):
+        return set()
+    keys = pd.read_parquet(store, columns=KEY)
+    keys['Year'] = keys['Year'].astype('int64')
+    return set(keys.itertuples(index=False, name=None))
+
+
+def mark_version(store):
+    """ rewrite the store's version file so running dashboards reload the data
+    :param store: path of the store folder
+    """
+    with open(os.path.join(store, cancer_data.VERSION_FILE), 'w') as f:
+        f.write(str(time.time_ns()))
+
+
+def clean(chunk):
+    """ coerce one chunk to the store's types and drop rows that are not usable
+    :param chunk: DataFrame read from the csv
+    :return: (valid rows, number of rejected rows)
+    """
+    missing = [column for column in cancer_data.DTYPES if column not in chunk.columns]
+    if missing:
+        raise ValueError("missing columns: %s" % ', '.join(missing))
+    chunk = chunk[list(cancer_data.DTYPES)].copy()
+    for column in TEXT_COLUMNS:
+        chunk[column] = chunk[column].str.strip()
+    chunk['Year'] = pd.to_numeric(chunk['Year'], errors='coerce')
+    chunk['AgeAdjustedRate'] = pd.to_numeric(chunk['AgeAdjustedRate'], errors='coerce').astype('float32')
+    for column in COUNT_COLUMNS:
+        chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+
+    valid = chunk[KEY].notna().all(axis=1) & (chunk[KEY[:2] + KEY[3:]] != '').all(axis=1)
+    valid &= chunk['Code'].str.fullmatch('[A-Z]{2}').fillna(False).astype(bool)
+    # the dashboard stores Population as a plain integer and divides by it for the per-capita rates
+    valid &= chunk['Population'].notna()
+    for column in COUNT_COLUMNS:
+        valid &= ~(chunk[column] < 0).fillna(False).astype(bool)
+    chunk = chunk[valid]
+    chunk['Year'] = chunk['Year'].astype('int16')
+    for column in COUNT_COLUMNS:
+        chunk[column] = chunk[column].astype('Int32')
+    return chunk, int((~valid).sum())
+
+
+def ingest(files, store, chunksize=CHUNK_SIZE):
+    """ stream the csv files into the store
+    :param files: list of csv paths
+    :param store: path of the store folder
+    :param chunksize: rows read at a time
+    :return: dict with the number of rows added, duplicate and rejected
+    """
+    seen = stored_keys(store)
+    counts = {'added': 0, 'duplicate': 0, 'rejected': 0}
+    try:
+        for file in files:
+            for chunk in pd.read_csv(file, chunksize=chunksize, dtype=str, na_values=['Na']):
+                chunk, rejected = clean(chunk)
+                counts['rejected'] += rejected
+                new = []
+                for key in zip(*(chunk[column].tolist() for column in KEY)):
+                    new.append(key not in seen)
+                    seen.add(key)
+                counts['duplicate'] += new.count(False)
+                chunk = chunk[new]
+                if len(chunk):
+                    chunk.to_parquet(store, partition_cols=['Year'], index=False)
+                    counts['added'] += len(chunk)
+    finally:
+        # once at the end, so running dashboards reload the data once instead of after every chunk,
+        # and also after a failed file so the rows already written are not left unseen
+        if counts['added']:
+            mark_version(store)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='+', help='csv extracts with the same columns as Compiled data.csv')
+    parser.add_argument('--store', default=cancer_data.DATA_STORE)
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    counts = ingest(args.files, args.store, args.chunksize)
+    print("added %(added)d rows, skipped %(duplicate)d duplicates and %(rejected)d invalid rows" % counts)
+
+
+if __name__ == '__main__':
+    main()
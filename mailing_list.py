@@ -0,0 +1,344 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import queue
+import atexit
+import threading
+import sqlite3
+from sqlite3 import Error
+from email.utils import parseaddr
+import telemetry
+
+DATABASE = os.environ.get('EMAILS_DB', r"SQLDatabase.db")
+
+sql_create_emails_table = """ CREATE TABLE IF NOT EXISTS emails (
+                                        id integer PRIMARY KEY,
+                                        email text NOT NULL,
+                                        date text
+                                    ); """
+
+# one row per address, older databases are deduplicated by init_db before this is created
+sql_create_emails_index = """ CREATE UNIQUE INDEX IF NOT EXISTS emails_email ON emails(email); """
+
+sql_insert_email = ''' INSERT INTO emails(email,date)
+                       VALUES(?1,?2)
+                       ON CONFLICT(email) DO NOTHING '''
+
+# the same insert for a database init_db could not index, ON CONFLICT(email) fails without the index
+sql_insert_email_unindexed = ''' INSERT INTO emails(email,date)
+                                 SELECT ?1, ?2
+                                 WHERE NOT EXISTS (SELECT 1 FROM emails WHERE email = ?1) '''
+
+BATCH_SIZE = 200
+# seconds to keep collecting emails after the first one arrives before committing
+BATCH_WAIT = 0.05
+# seconds sqlite waits on a lock held by another worker before raising
+BUSY_TIMEOUT = 5
+LOCKED_RETRIES = 5
+# rows fetched per query when paging through the list
+PAGE_SIZE = 1000
+
+
+def create_connection(file):
+    conn = None
+    try:
+        conn = sqlite3.connect(file, timeout=BUSY_TIMEOUT)
+    except Error as e:
+        print(e)
+
+    return conn
+
+
+def create_table(conn, create_table_sql):
+    """ create a table from the create_table_sql statement
+    :param conn: Connection object
+    :param create_table_sql: a CREATE TABLE statement
+    :return:
+    """
+    try:
+        c = conn.cursor()
+        c.execute(create_table_sql)
+    except Error as e:
+        print(e)
+
+
+def valid_email(email):
+    """ check that an address is one plain addr-spec, safe to put in a mail header
+    :param email: address as stored
+    :return: bool
+    """
+    if not email or any(ch in email for ch in '\r\n\0'):
+        return False
+    name, address = parseaddr(email)
+    return not name and address == email and '@' in address and ' ' not in address
+
+
+def normalize_email(email):
+    """ clean up an address from the signup form
+    :param email: address as typed
+    :return: the normalized address, None if it is not a valid address
+    """
+    email = email.strip().lower()
+    return email if valid_email(email) else None
+
+
+def create_email(conn, email, indexed=True):
+    """
+    Create a new email into the emails table, an address that is already there is left as is
+    :param conn:
+    :param email:
+    :param indexed: False if init_db could not create the unique index on email
+    :return: email id, None if it was already on the list
+    """
+    cur = conn.cursor()
+    cur.execute(sql_insert_email if indexed else sql_insert_email_unindexed, email)
+    conn.commit()
+    return cur.lastrowid if cur.rowcount else None
+
+
+def create_emails(conn, emails, indexed=True):
+    """
+    Insert a batch of emails into the emails table in one transaction, skipping addresses already there
+    :param conn:
+    :param emails: list of (email, date) tuples
+    :param indexed: False if init_db could not create the unique index on email
+    :return:
+    """
+    with conn:
+        conn.executemany(sql_insert_email if indexed else sql_insert_email_unindexed, emails)
+
+
+def dedupe_emails(conn):
+    """
+    Normalize the stored addresses and keep only the first signup of each
+    :param conn:
+    :return: number of rows removed
+    """
+    with conn:
+        cur = conn.execute(''' DELETE FROM emails WHERE id NOT IN
+                               (SELECT MIN(id) FROM emails GROUP BY lower(trim(email))) ''')
+        conn.execute(''' UPDATE emails SET email = lower(trim(email)) WHERE email != lower(trim(email)) ''')
+    return cur.rowcount
+
+
+def page_emails(conn, after_id=0, limit=PAGE_SIZE):
+    """
+    Read one page of the list in id order, pass the last id of a page to get the next one
+    :param conn:
+    :param after_id: id of the last row already read
+    :param limit: rows per page
+    :return: list of (id, email, date) tuples
+    """
+    sql = ''' SELECT id, email, date FROM emails
+              WHERE id > ?
+              ORDER BY id
+              LIMIT ? '''
+    return conn.execute(sql, (after_id, limit)).fetchall()
+
+
+def iter_emails(conn, page_size=PAGE_SIZE):
+    """
+    Yield every row of the list while holding only one page in memory
+    :param conn:
+    :param page_size: rows per query
+    :return: iterator of (id, email, date) tuples
+    """
+    after_id = 0
+    while True:
+        rows = page_emails(conn, after_id, page_size)
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1][0]
+
+
+def export_emails(conn, out, fmt='csv', page_size=PAGE_SIZE):
+    """
+    Stream the list to a file as csv or json lines
+    :param conn:
+    :param out: text file object
+    :param fmt: 'csv' or 'jsonl'
+    :param page_size: rows per query
+    :return: number of rows written
+    """
+    columns = ['id', 'email', 'date']
+    if fmt == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        write = writer.writerow
+    else:
+        def write(row):
+            out.write(json.dumps(dict(zip(columns, row))) + '\n')
+    count = 0
+    for row in iter_emails(conn, page_size):
+        write(row)
+        count += 1
+    return count
+
+
+def create_index(conn):
+    """ deduplicate the list and create the unique index on email, waiting out another worker's lock
+    :param conn:
+    :return: True if the index was created
+    """
+    for attempt in range(LOCKED_RETRIES):
+        try:
+            # a database from before the index may hold repeated signups
+            dedupe_emails(conn)
+            conn.execute(sql_create_emails_index)
+            return True
+        except Error as e:
+            if not is_locked(e):
+                print(e)
+                return False
+            time.sleep(0.1 * 2 ** attempt)
+    print("Error! database is locked, the emails index was not created.")
+    return False
+
+
+def init_db(file=DATABASE):
+    """ create the emails table, run once at startup before any worker writes
+    :param file: path of the sqlite database
+    :return: True if the unique index on email exists, inserts must use indexed=False otherwise
+    """
+    conn = create_connection(file)
+    if conn is None:
+        print("Error! cannot create the database connection.")
+        return False
+    try:
+        # create email table
+        create_table(conn, sql_create_emails_table)
+        conn.execute('PRAGMA journal_mode=WAL')
+        index = conn.execute(""" SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'emails_email' """)
+        return index.fetchone() is not None or create_index(conn)
+    except Error as e:
+        print(e)
+        return False
+    finally:
+        conn.close()
+
+
+def is_locked(e):
+    return isinstance(e, sqlite3.OperationalError) and 'locked' in str(e)
+
+
+class EmailWriter:
+    """ Background thread that owns the only connection of this process and group
+    commits the emails queued by the signup callback
+    """
+
+    def __init__(self, file, batch_size=BATCH_SIZE, batch_wait=BATCH_WAIT):
+        self.file = file
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        telemetry.gauge('email_queue_depth', lambda: self.queue.qsize(), 'emails waiting for the writer thread')
+
+    def submit(self, email):
+        """ queue an email for the next batch
+        :param email: (email, date) tuple
+        :return:
+        """
+        self._start()
+        self.queue.put(email)
+
+    def flush(self):
+        """ block until everything queued so far is written
+        """
+        if self._thread is not None and self._pid == os.getpid():
+            self.queue.join()
+
+    def _start(self):
+        # threads do not survive a fork, so each worker process starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name='email-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+            atexit.register(self.flush)
+
+    def _next_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn, batch, indexed=True):
+        for attempt in range(LOCKED_RETRIES):
+            start = time.perf_counter()
+            try:
+                create_emails(conn, batch, indexed)
+                telemetry.observe('sqlite_write_seconds', time.perf_counter() - start)
+                telemetry.count('emails_written_total', len(batch))
+                return
+            except Error as e:
+                if not is_locked(e):
+                    print(e)
+                    telemetry.count('email_write_errors_total', len(batch), error='other')
+                    return
+                telemetry.count('sqlite_locked_retries_total')
+                time.sleep(0.1 * 2 ** attempt)
+        print("Error! database is locked, dropped %d emails." % len(batch))
+        telemetry.count('email_write_errors_total', len(batch), error='locked')
+
+    def _run(self):
+        # the app may be served without the gunicorn hook that calls init_db, and it is cheap when done
+        indexed = init_db(self.file)
+        conn = create_connection(self.file)
+        if conn is not None:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        while True:
+            batch = self._next_batch()
+            try:
+                if conn is None:
+                    print("Error! cannot create the database connection.")
+                    telemetry.count('email_write_errors_total', len(batch), error='connect')
+                else:
+                    self._write(conn, batch, indexed)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the mailing list.')
+    parser.add_argument('--database', default=DATABASE)
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    parser.add_argument('--output', help='file to write, stdout if omitted')
+    args = parser.parse_args()
+
+    init_db(args.database)
+    conn = create_connection(args.database)
+    if conn is None:
+        print("Error! cannot create the database connection.")
+        return
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        count = export_emails(conn, out, args.format)
+    finally:
+        if args.output:
+            out.close()
+        conn.close()
+    print("exported %d emails" % count, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
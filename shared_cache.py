@@ -0,0 +1,127 @@
+""" Figures and map arrays shared by every worker process through one SQLite file.
+
+Entries are stored under the data version they were built from, so a worker never
+reads a figure of older data, and `prune` drops the other versions once new data is warm.
+Set SHARED_CACHE to an empty string to turn it off.
+"""
+import os
+import json
+import zlib
+import hashlib
+import threading
+import sqlite3
+from sqlite3 import Error
+import telemetry
+
+FILE = os.environ.get('SHARED_CACHE', 'figure_cache.db')
+# seconds a reader or writer waits on another process's lock before giving up on the cache
+BUSY_TIMEOUT = 2
+
+sql_create_cache_table = """ CREATE TABLE IF NOT EXISTS cache (
+                                    version text NOT NULL,
+                                    key text NOT NULL,
+                                    value blob NOT NULL,
+                                    PRIMARY KEY (version, key)
+                                ) WITHOUT ROWID; """
+
+_local = threading.local()
+
+
+def enabled():
+    return bool(FILE)
+
+
+def version_key(version):
+    """ short, process independent name of a data version
+    :param version: data version tuple from cancer_data.data_version
+    :return: str
+    """
+    return hashlib.sha1(json.dumps(version).encode()).hexdigest()
+
+
+def entry_key(key):
+    return json.dumps(key, separators=(',', ':'))
+
+
+def _connection():
+    # sqlite connections must not cross threads or a fork, so each thread of each process opens its own
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(FILE, timeout=BUSY_TIMEOUT)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(sql_create_cache_table)
+        _local.conn, _local.pid = conn, os.getpid()
+    return conn
+
+
+def get(version, key):
+    """ read one entry
+    :param version: data version tuple
+    :param key: json friendly key
+    :return: the stored value, None if it is missing or the cache is unavailable
+    """
+    if not enabled():
+        return None
+    try:
+        row = _connection().execute('SELECT value FROM cache WHERE version = ? AND key = ?',
+                                    (version_key(version), entry_key(key))).fetchone()
+    except Error as e:
+        print(e)
+        telemetry.count('shared_cache_errors_total', op='get')
+        return None
+    return None if row is None else json.loads(zlib.decompress(row[0]))
+
+
+def put_many(version, items):
+    """ store entries in one transaction, an entry another worker already stored is kept
+    :param version: data version tuple
+    :param items: iterable of (key, value) pairs, values must be json friendly
+    """
+    if not enabled():
+        return
+    name = version_key(version)
+    rows = [(name, entry_key(key), zlib.compress(json.dumps(value, separators=(',', ':')).encode()))
+            for key, value in items]
+    try:
+        conn = _connection()
+        with conn:
+            conn.executemany('INSERT OR IGNORE INTO cache(version, key, value) VALUES(?,?,?)', rows)
+    except Error as e:
+        print(e)
+        telemetry.count('shared_cache_errors_total', op='put')
+
+
+def put(version, key, value):
+    put_many(version, [(key, value)])
+
+
+def keys(version):
+    """ keys already stored for a data version
+    :return: set of encoded keys
+    """
+    if not enabled():
+        return set()
+    try:
+        return {row[0] for row in _connection().execute('SELECT key FROM cache WHERE version = ?',
+                                                         (version_key(version),))}
+    except Error as e:
+        print(e)
+        telemetry.count('shared_cache_errors_total', op='keys')
+        return set()
+
+
+def prune(version):
+    """ delete the entries of every other data version
+    :param version: data version tuple to keep
+    :return: number of entries deleted
+    """
+    if not enabled():
+        return 0
+    try:
+        conn = _connection()
+        with conn:
+            return conn.execute('DELETE FROM cache WHERE version != ?', (version_key(version),)).rowcount
+    except Error as e:
+        print(e)
+        telemetry.count('shared_cache_errors_total', op='prune')
+        return 0
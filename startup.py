@@ -0,0 +1,49 @@
+import os
+import time
+
+# seconds spent in each named phase of the import, in the order they ran
+timings = {}
+_last = time.perf_counter()
+
+
+def mark(name):
+    """ record the time since the previous mark as the phase that just finished
+    :param name: label of the phase
+    """
+    global _last
+    now = time.perf_counter()
+    timings[name] = timings.get(name, 0) + now - _last
+    _last = now
+
+
+def report():
+    """ print the phase breakdown when STARTUP_TIMING is set in the environment
+    """
+    if not os.environ.get('STARTUP_TIMING'):
+        return
+    for name, seconds in timings.items():
+        print("startup %-16s %7.3fs" % (name, seconds))
+    print("startup %-16s %7.3fs" % ('total', sum(timings.values())))
+
+
+def cache_layout(app, version):
+    """ serve /_dash-layout from json serialized once per data version instead of on every page load,
+    call after app.layout is set
+    :param app: Dash app
+    :param version: function returning the version of the data the layout is built from
+    """
+    import flask
+    endpoint = app.config.routes_pathname_prefix + '_dash-layout'
+    serve_layout = app.server.view_functions[endpoint]
+    # (version, json bytes) of the last layout served
+    cached = [(None, None)]
+
+    def serve_cached_layout():
+        current = version()
+        cached_version, data = cached[0]
+        if data is None or cached_version != current:
+            data = serve_layout().get_data()
+            cached[0] = (current, data)
+        return flask.Response(data, mimetype='application/json')
+
+    app.server.view_functions[endpoint] = serve_cached_layout
@@ -0,0 +1,263 @@
+""" In-process metrics served in the Prometheus text format at /metrics.
+
+Each process counts in memory. With TELEMETRY_DIR set (gunicorn.conf.py does) every process
+also saves its numbers there once a second, and a scrape answered by any worker adds them all up.
+"""
+import os
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# upper bounds in seconds, shared by every histogram
+BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+# /metrics answers only loopback clients unless this is set
+ALLOW_REMOTE = bool(os.environ.get('METRICS_ALLOW_REMOTE'))
+# folder shared by the processes of one server, None to report this process only
+SHARED_DIR = os.environ.get('TELEMETRY_DIR')
+# seconds between saves of this process's numbers to SHARED_DIR
+SAVE_INTERVAL = 1
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_gauges = {}
+_help = {}
+_saver_pid = None
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def count(name, amount=1, **labels):
+    """ add to a counter
+    :param name: metric name, ending in _total
+    :param amount: how much to add
+    :param labels: label values
+    """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+    _start_saver()
+
+
+def observe(name, value, **labels):
+    """ record one value in a histogram
+    :param name: metric name
+    :param value: observed value, usually seconds
+    :param labels: label values
+    """
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            # one count per bucket, then the +Inf count and the sum
+            histogram = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        histogram[bisect.bisect_left(BUCKETS, value)] += 1
+        histogram[-1] += value
+    _start_saver()
+
+
+def gauge(name, read, description=None):
+    """ register a value read at scrape time, such as a queue length
+    :param name: metric name
+    :param read: function returning the current value
+    :param description: HELP text
+    """
+    _gauges[name] = read
+    if description:
+        _help[name] = description
+
+
+@contextmanager
+def timer(callback, phase):
+    """ time one phase of a callback into dash_callback_seconds
+    :param callback: callback name
+    :param phase: 'filter', 'figure' and so on
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        observe('dash_callback_seconds', seconds, callback=callback, phase=phase)
+        _add_to_request(callback, seconds)
+
+
+def _add_to_request(callback, seconds):
+    # the callback's own time, the rest of the request is Dash encoding the response
+    import flask
+    if flask.has_request_context():
+        flask.g.callback = callback
+        flask.g.callback_seconds = flask.g.get('callback_seconds', 0) + seconds
+
+
+def _start_saver():
+    # like the email writer, each process starts its own thread the first time it has something to save
+    global _saver_pid
+    if SHARED_DIR is None or _saver_pid == os.getpid():
+        return
+    _saver_pid = os.getpid()
+    threading.Thread(target=_save_loop, name='telemetry-saver', daemon=True).start()
+
+
+def _save_loop():
+    pid = os.getpid()
+    while _saver_pid == pid:
+        time.sleep(SAVE_INTERVAL)
+        _save()
+
+
+def _save():
+    """ write this process's numbers to SHARED_DIR/<pid>.json """
+    if SHARED_DIR is None:
+        return
+    with _lock:
+        counters = [[name, labels, value] for (name, labels), value in _counters.items()]
+        histograms = [[name, labels, list(values)] for (name, labels), values in _histograms.items()]
+    gauges = {name: read() for name, read in _gauges.items()}
+    path = os.path.join(SHARED_DIR, '%d.json' % os.getpid())
+    try:
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'counters': counters, 'histograms': histograms, 'gauges': gauges}, f)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(e)
+
+
+def _after_fork():
+    # a forked worker starts from zero, whatever the parent counted is in the parent's file
+    global _lock, _saver_pid
+    _lock = threading.Lock()
+    _counters.clear()
+    _histograms.clear()
+    _saver_pid = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_save, after_in_child=_after_fork)
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _collect():
+    """ numbers of this process, or the sum over every process saving to SHARED_DIR
+    :return: (counters, histograms, gauges) where gauges maps a name to (labels, value) pairs
+    """
+    if SHARED_DIR is None:
+        with _lock:
+            counters = dict(_counters)
+            histograms = {key: list(values) for key, values in _histograms.items()}
+        return counters, histograms, {name: [((), read())] for name, read in _gauges.items()}
+    _save()
+    counters, histograms, gauges = {}, {}, {}
+    for name in sorted(os.listdir(SHARED_DIR)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(SHARED_DIR, name)) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for metric, labels, value in saved['counters']:
+            key = metric, tuple(map(tuple, labels))
+            counters[key] = counters.get(key, 0) + value
+        for metric, labels, values in saved['histograms']:
+            key = metric, tuple(map(tuple, labels))
+            histograms[key] = [a + b for a, b in zip(histograms.get(key, [0] * len(values)), values)]
+        # counters of a worker that exited still count, its gauges no longer mean anything
+        pid = int(name[:-len('.json')])
+        if _is_running(pid):
+            for metric, value in saved['gauges'].items():
+                gauges.setdefault(metric, []).append(((('pid', pid),), value))
+    return counters, histograms, gauges
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                             for name, value in labels)
+
+
+def render():
+    """ format every metric in the Prometheus text format
+    :return: str
+    """
+    lines = []
+    counters, histograms, gauges = _collect()
+    counters = sorted(counters.items())
+    histograms = sorted(histograms.items())
+    typed = set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            typed.add(name)
+            lines.append('# TYPE %s counter' % name)
+        lines.append('%s%s %s' % (name, _labels(labels), value))
+    for (name, labels), values in histograms:
+        if name not in typed:
+            typed.add(name)
+            lines.append('# TYPE %s histogram' % name)
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS + ['+Inf'], values[:-1]):
+            cumulative += bucket
+            lines.append('%s_bucket%s %d' % (name, _labels(labels + (('le', bound),)), cumulative))
+        lines.append('%s_sum%s %f' % (name, _labels(labels), values[-1]))
+        lines.append('%s_count%s %d' % (name, _labels(labels), cumulative))
+    for name, values in sorted(gauges.items()):
+        if name in _help:
+            lines.append('# HELP %s %s' % (name, _help[name]))
+        lines.append('# TYPE %s gauge' % name)
+        for labels, value in values:
+            lines.append('%s%s %s' % (name, _labels(labels), value))
+    return '\n'.join(lines) + '\n'
+
+
+def instrument(app):
+    """ time every callback request and serve /metrics
+    :param app: Dash app
+    """
+    import flask
+    update_path = app.config.requests_pathname_prefix + '_dash-update-component'
+
+    def callback_name(output):
+        # label values come from the app's own callbacks, never from the request body
+        callback = app.callback_map.get(output, {}).get('callback')
+        return getattr(callback, '__name__', 'unknown')
+
+    @app.server.before_request
+    def start_timer():
+        if flask.request.path == update_path:
+            flask.g.request_start = time.perf_counter()
+
+    @app.server.after_request
+    def stop_timer(response):
+        start = flask.g.get('request_start')
+        if start is not None:
+            seconds = time.perf_counter() - start
+            body = flask.request.get_json(silent=True) or {}
+            output = body.get('output') if isinstance(body, dict) else None
+            callback = callback_name(output) if isinstance(output, str) else 'unknown'
+            observe('dash_request_seconds', seconds, callback=callback)
+            if 'callback_seconds' in flask.g:
+                observe('dash_callback_seconds', max(seconds - flask.g.callback_seconds, 0),
+                        callback=flask.g.callback, phase='serialize')
+            if response.status_code >= 500:
+                count('dash_callback_errors_total', callback=callback)
+        return response
+
+    @app.server.route(app.config.routes_pathname_prefix + 'metrics')
+    def metrics():
+        if not ALLOW_REMOTE and flask.request.remote_addr not in ('127.0.0.1', '::1'):
+            flask.abort(403)
+        return flask.Response(render(), mimetype='text/plain; version=0.0.4')
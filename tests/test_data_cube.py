@@ -0,0 +1,82 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cancer_data
+import data_cube
+
+COLUMNS = ['Year', 'Sex', 'Race', 'CaseCount']
+
+
+def make_cube(rows):
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df['Area'] = 'Alabama'
+    df['Code'] = 'AL'
+    df['CancerType'] = 'Lung and Bronchus'
+    df['AgeAdjustedRate'] = 1.0
+    df['DeathCount'] = df['CaseCount'] // 2
+    df['Population'] = 1000000
+    return data_cube.Cube(cancer_data.CancerData(df[list(cancer_data.DTYPES)].astype(cancer_data.DTYPES)))
+
+
+def cases(cube, year=None, sex=None, race=None):
+    return int(cube.map_rows('Lung and Bronchus', year, sex, race)['CaseCount'].sum())
+
+
+def national(cube, year=None, sex=None, race=None):
+    return int(cube.totals(year, sex, race)['CaseCount'].sum())
+
+
+def test_full_cube_uses_the_total_row():
+    cube = make_cube([
+        (2018, 'Male and Female', 'All Races', 110),
+        (2018, 'Male', 'All Races', 50),
+        (2018, 'Female', 'All Races', 60),
+        (2018, 'Male', 'White', 30),
+        (2018, 'Male', 'Black', 20),
+    ])
+    assert cases(cube, 2018) == 110
+    assert cases(cube) == 110
+    assert national(cube) == 110
+    assert cases(cube, sex='Male') == 50
+    assert national(cube, sex='Male') == 50
+    assert cases(cube, race='White') == 30
+
+
+def test_partial_cube_sums_the_most_aggregated_level():
+    cube = make_cube([
+        (2018, 'Male', 'All Races', 50),
+        (2018, 'Female', 'All Races', 60),
+        (2018, 'Male', 'White', 30),
+        (2018, 'Male', 'Black', 20),
+    ])
+    assert cases(cube) == 110
+    assert national(cube, 2018) == 110
+    assert cases(cube, sex='Male') == 50
+
+
+def test_without_total_rows_the_breakdowns_are_summed():
+    cube = make_cube([
+        (2018, 'Male', 'White', 30),
+        (2018, 'Male', 'Black', 20),
+        (2018, 'Female', 'White', 40),
+    ])
+    assert cases(cube) == 90
+    assert cases(cube, race='White') == 70
+    assert cases(cube, sex='Male') == 50
+
+
+def test_each_year_picks_its_own_level():
+    cube = make_cube([
+        (2018, 'Male and Female', 'All Races', 110),
+        (2018, 'Male', 'White', 30),
+        (2019, 'Male', 'White', 35),
+        (2019, 'Male', 'Black', 25),
+    ])
+    assert cases(cube, 2018) == 110
+    assert cases(cube, 2019) == 60
+    assert cases(cube) == 170
+    assert national(cube) == 170
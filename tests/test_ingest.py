@@ -0,0 +1,56 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cancer_data
+import ingest
+
+HEADER = 'Area,CancerType,Year,Sex,Race,AgeAdjustedRate,CaseCount,Population,DeathCount,Code\n'
+
+
+def test_rows_without_population_are_rejected(tmp_path):
+    extract = tmp_path / 'extract.csv'
+    extract.write_text(HEADER +
+                       'Alabama,Ovary,2018,Female,All Races,9.1,300,2500000,200,AL\n'
+                       'Alaska,Ovary,2018,Female,All Races,8.2,40,Na,20,AK\n'
+                       'Arizona,Ovary,2018,Female,All Races,Na,Na,3500000,Na,AZ\n')
+    store = str(tmp_path / 'store')
+
+    counts = ingest.ingest([str(extract)], store)
+
+    assert counts == {'added': 2, 'duplicate': 0, 'rejected': 1}
+    data = cancer_data.load(str(extract), store)
+    assert sorted(data.df['Code'].astype(str)) == ['AL', 'AZ']
+    assert data.df['CaseCount'].isna().sum() == 1
+
+
+def test_append_changes_the_data_version(tmp_path):
+    first = tmp_path / 'first.csv'
+    first.write_text(HEADER + 'Alabama,Ovary,2018,Female,All Races,9.1,300,2500000,200,AL\n')
+    second = tmp_path / 'second.csv'
+    second.write_text(HEADER + 'Alabama,Ovary,2019,Female,All Races,9.3,310,2510000,205,AL\n')
+    store = str(tmp_path / 'store')
+
+    ingest.ingest([str(first)], store)
+    version = cancer_data.data_version(str(first), store)
+    ingest.ingest([str(second)], store)
+
+    assert cancer_data.data_version(str(first), store) != version
+    assert len(cancer_data.load(str(first), store).df) == 2
+
+
+def test_version_is_marked_once_per_ingest(tmp_path, monkeypatch):
+    extract = tmp_path / 'extract.csv'
+    extract.write_text(HEADER +
+                       'Alabama,Ovary,2018,Female,All Races,9.1,300,2500000,200,AL\n'
+                       'Alaska,Ovary,2018,Female,All Races,8.2,40,700000,20,AK\n'
+                       'Arizona,Ovary,2018,Female,All Races,8.5,500,7000000,300,AZ\n')
+    store = str(tmp_path / 'store')
+    marks = []
+    monkeypatch.setattr(ingest, 'mark_version', marks.append)
+
+    counts = ingest.ingest([str(extract)], store, chunksize=1)
+
+    assert counts['added'] == 3
+    assert marks == [store]
@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mailing_list
+
+
+def stored(file):
+    conn = mailing_list.create_connection(file)
+    try:
+        return [row[1] for row in mailing_list.page_emails(conn)]
+    finally:
+        conn.close()
+
+
+def test_init_db_dedupes_and_indexes_an_old_list(tmp_path):
+    file = str(tmp_path / 'emails.db')
+    conn = mailing_list.create_connection(file)
+    mailing_list.create_table(conn, mailing_list.sql_create_emails_table)
+    with conn:
+        conn.executemany('INSERT INTO emails(email,date) VALUES(?,?)',
+                         [('a@example.com', '2024-01-01'), (' A@example.com', '2024-01-02')])
+    conn.close()
+
+    assert mailing_list.init_db(file)
+
+    writer = mailing_list.EmailWriter(file)
+    writer.submit(('a@example.com', '2024-01-03'))
+    writer.submit(('b@example.com', '2024-01-03'))
+    writer.flush()
+    assert stored(file) == ['a@example.com', 'b@example.com']
+
+
+def test_signups_are_kept_when_the_index_cannot_be_created(tmp_path, monkeypatch):
+    file = str(tmp_path / 'emails.db')
+    monkeypatch.setattr(mailing_list, 'sql_create_emails_index', 'CREATE UNIQUE INDEX emails_email ON missing(email)')
+
+    assert not mailing_list.init_db(file)
+
+    writer = mailing_list.EmailWriter(file)
+    for email in ['a@example.com', 'b@example.com', 'a@example.com']:
+        writer.submit((email, '2024-01-03'))
+    writer.flush()
+    assert stored(file) == ['a@example.com', 'b@example.com']
@@ -0,0 +1,41 @@
+""" Fill the shared figure cache for the current data before traffic arrives.
+
+    python warm_cache.py              # once
+    python warm_cache.py --watch 30   # and again whenever the data changes
+
+gunicorn.conf.py starts it with --watch next to the workers.
+"""
+import os
+import time
+import argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--watch', type=float, metavar='SECONDS',
+                        help='check the data every SECONDS and warm again after it changed')
+    args = parser.parse_args()
+
+    # data and cache paths are relative to the project folder, like in the app
+    os.chdir(HERE)
+    import cancer_data
+    import figure_cache
+    import shared_cache
+    if not shared_cache.enabled():
+        print("SHARED_CACHE is empty, nothing to warm")
+        return
+    warmed = None
+    while True:
+        if cancer_data.data_version() != warmed:
+            start = time.perf_counter()
+            warmed, count = figure_cache.warm_shared()
+            print("warmed %d entries in %.1fs" % (count, time.perf_counter() - start), flush=True)
+        if not args.watch:
+            return
+        time.sleep(args.watch)
+
+
+if __name__ == '__main__':
+    main()
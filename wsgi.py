@@ -0,0 +1,36 @@
+""" WSGI entry point, run with:  gunicorn -c gunicorn.conf.py wsgi:application
+"""
+import os
+import importlib.util
+# first, so the startup timings include the imports below
+import startup
+import figure_cache
+import mailing_list
+startup.mark('import wsgi modules')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, 'ITSC 3155 Final Project.py')
+
+
+def load_dashboard():
+    """ import the dashboard script, its file name is not a valid module name
+    :return: the loaded module
+    """
+    spec = importlib.util.spec_from_file_location('dashboard', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def init():
+    """ one time setup, called by the gunicorn master before forking workers
+    """
+    mailing_list.init_db(mailing_list.DATABASE)
+    figure_cache.warm()
+
+
+# paths in the app are relative to the project folder
+os.chdir(HERE)
+dashboard = load_dashboard()
+app = dashboard.app
+application = app.server